@@ -0,0 +1,327 @@
+# bankers_bench.py
+"""
+Benchmarks for the Banker's Algorithm engines in bankers_logic.py.
+The correctness checks live in test_bankers_logic.py.
+
+Usage:
+    python bankers_bench.py numpy [--sizes 1000,10000,100000] [--resources 16]
+    python bankers_bench.py incremental [--sizes 1000,10000,100000] [--resources 16]
+    python bankers_bench.py batch [--processes 2000] [--burst 64] [--bursts 50]
+    python bankers_bench.py memory [--processes 100000] [--resources 32]
+    python bankers_bench.py fork [--sizes 1000,10000,100000]
+    python bankers_bench.py whatif [--processes 5000] [--candidates 400] [--workers 1,2,4,8]
+    python bankers_bench.py load [--processes 1000000] [--resources 8]
+    python bankers_bench.py detection [--processes 200] [--events 20000] [--detect-every 1000]
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+from array import array
+
+from bankers_logic import BankersAlgorithm, CompactBankersAlgorithm, FlatMatrix, NumpyBankersAlgorithm, np
+from bankers_replay import generate_trace, iter_events, random_state
+
+
+def _time_call(fn, repeat=3):
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def bench_numpy(sizes, num_resources, scan_limit):
+    """
+    Compares the pure-Python scan in BankersAlgorithm.is_safe_state with the
+    vectorized NumpyBankersAlgorithm on the same states. The O(n^2 * m) scan
+    is skipped above scan_limit processes.
+    """
+    print(f"{'processes':>10} {'scan (s)':>12} {'numpy (s)':>12} {'speedup':>10}")
+    for n in sizes:
+        state = random_state(n, num_resources, seed=n)
+
+        vectorized = NumpyBankersAlgorithm(*state)
+        t_numpy, (safe, _) = _time_call(vectorized.is_safe_state)
+        assert safe, "benchmark state should be safe"
+
+        if n <= scan_limit:
+            t_scan, (safe_scan, _) = _time_call(BankersAlgorithm(*state).is_safe_state, repeat=1)
+            assert safe_scan == safe
+            print(f"{n:>10} {t_scan:>12.4f} {t_numpy:>12.4f} {t_scan / t_numpy:>9.1f}x")
+        else:
+            print(f"{n:>10} {'skipped':>12} {t_numpy:>12.4f} {'-':>10}")
+
+
+def bench_incremental(sizes, num_resources, scan_limit):
+    """
+    Compares the restart-from-P0 scan with the sorted-queue incremental
+    strategy of BankersAlgorithm on the same states.
+    """
+    print(f"{'processes':>10} {'scan (s)':>12} {'incr (s)':>12} {'speedup':>10}")
+    for n in sizes:
+        state = random_state(n, num_resources, seed=n)
+
+        incremental = BankersAlgorithm(*state, strategy="incremental")
+        t_incr, (safe, sequence) = _time_call(incremental.is_safe_state)
+        assert safe, "benchmark state should be safe"
+
+        if n <= scan_limit:
+            t_scan, result = _time_call(BankersAlgorithm(*state).is_safe_state, repeat=1)
+            assert result == (safe, sequence)
+            print(f"{n:>10} {t_scan:>12.4f} {t_incr:>12.4f} {t_scan / t_incr:>9.1f}x")
+        else:
+            print(f"{n:>10} {'skipped':>12} {t_incr:>12.4f} {'-':>10}")
+
+
+def random_burst(rng, banker, size):
+    """A burst of small requests, each within the requesting process's need."""
+    burst = []
+    for _ in range(size):
+        pid = rng.randrange(banker.num_processes)
+        burst.append((pid, [rng.randint(0, min(1, int(x))) for x in banker.need[pid]]))
+    return burst
+
+
+def bench_batch(num_processes, num_resources, burst_size, bursts, engine):
+    """
+    Throughput of request_resources_batch against a loop of single
+    request_resources calls on identical bursts.
+    """
+    available, max_demand, allocation = random_state(num_processes, num_resources, seed=1)
+    available = [a + burst_size * bursts for a in available]  # leave room so most requests are granted
+
+    def run(batched):
+        banker = engine(available, [list(r) for r in max_demand], [list(r) for r in allocation])
+        rng = random.Random(7)
+        granted = total = 0
+        start = time.perf_counter()
+        for _ in range(bursts):
+            burst = random_burst(rng, banker, burst_size)
+            if batched:
+                results = banker.request_resources_batch(burst)
+            else:
+                results = [banker.request_resources(pid, request) for pid, request in burst]
+            granted += sum(ok for ok, _ in results)
+            total += len(results)
+        return time.perf_counter() - start, granted, total
+
+    for label, batched in (("single", False), ("batch", True)):
+        elapsed, granted, total = run(batched)
+        print(f"{label:>7}: {total / elapsed:>10.0f} req/s  ({granted}/{total} granted, {elapsed:.3f}s)")
+
+
+def bench_memory(num_processes, num_resources, max_value):
+    """
+    Memory held by a state in the list-of-lists BankersAlgorithm versus the
+    flat-buffer CompactBankersAlgorithm. Values above 256 are used by default
+    because CPython caches small ints, which hides the per-int object cost.
+    """
+    rng = random.Random(3)
+    allocation = [[rng.randint(0, max_value) for _ in range(num_resources)] for _ in range(num_processes)]
+    max_demand = [[a + rng.randint(0, max_value) for a in row] for row in allocation]
+    available = [max_value * 4] * num_resources
+    raw = 3 * num_processes * num_resources * 8
+
+    print(f"state: {num_processes} x {num_resources}, raw int64 data {raw / 2**20:.1f} MiB")
+    for engine in (BankersAlgorithm, CompactBankersAlgorithm):
+        tracemalloc.start()
+        banker = engine(available, max_demand, allocation)
+        held, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"{engine.__name__:>24}: {held / 2**20:>9.1f} MiB  ({held / raw:.1f}x raw)")
+        del banker
+
+
+def bench_fork(sizes, num_resources):
+    """
+    Cost of BankersAlgorithm.fork() versus building a new banker from the
+    same matrices, and how many rows a what-if request actually copies.
+    """
+    print(f"{'processes':>10} {'rebuild (s)':>12} {'fork (s)':>12} {'rows copied':>12}")
+    for n in sizes:
+        state = random_state(n, num_resources, seed=n)
+        banker = BankersAlgorithm(*state, strategy="incremental")
+        banker.is_safe_state()
+
+        t_rebuild, _ = _time_call(lambda: BankersAlgorithm(banker.available, banker.max_demand, banker.allocation))
+        t_fork, snapshot = _time_call(banker.fork)
+
+        pid = n // 2
+        snapshot.release_resources(pid, [1 if a else 0 for a in banker.allocation[pid]])
+        print(f"{n:>10} {t_rebuild:>12.4f} {t_fork:>12.6f} {len(snapshot.allocation._owned):>12}")
+        snapshot.discard()
+
+
+def bench_whatif(num_processes, num_resources, num_candidates, worker_counts):
+    """
+    Scaling of BankersAlgorithm.evaluate_candidates across worker processes,
+    against the in-process serial evaluation. Pool start-up and the copy
+    into shared memory are included in every parallel timing.
+    """
+    available, max_demand, allocation = random_state(num_processes, num_resources, seed=5)
+    available = [a + 6 for a in available]  # enough slack that most candidates reach the safety check
+    banker = BankersAlgorithm(available, max_demand, allocation, strategy="incremental")
+    rng = random.Random(11)
+    candidates = [(rng.randrange(num_processes), [rng.randint(0, 1) for _ in range(num_resources)])
+                  for _ in range(num_candidates)]
+
+    t_serial, expected = _time_call(lambda: banker.evaluate_candidates(candidates), repeat=1)
+    print(f"{num_candidates} candidates on {num_processes} x {num_resources}, "
+          f"{sum(ok for ok, _ in expected)} grantable")
+    print(f"{'workers':>8} {'time (s)':>10} {'speedup':>10}")
+    print(f"{'serial':>8} {t_serial:>10.3f} {'1.0x':>10}")
+    for workers in worker_counts:
+        elapsed, results = _time_call(lambda: banker.evaluate_candidates(candidates, workers=workers), repeat=1)
+        assert [ok for ok, _ in results] == [ok for ok, _ in expected], "parallel verdicts differ"
+        print(f"{workers:>8} {elapsed:>10.3f} {t_serial / elapsed:>9.1f}x")
+
+
+def bench_load(num_processes, num_resources, list_limit):
+    """
+    Save and load times of the binary state format. The memory-mapped
+    CompactBankersAlgorithm load is compared with reading the file into
+    memory and with the list-of-lists and NumPy engines, which convert the
+    data. The list engine is skipped above list_limit processes.
+    """
+    cells = num_processes * num_resources
+    allocation = FlatMatrix(num_processes, num_resources, array('q', (k * 7 % 4 for k in range(cells))))
+    max_demand = FlatMatrix(num_processes, num_resources, array('q', (k * 7 % 4 + k % 5 for k in range(cells))))
+    banker = CompactBankersAlgorithm([5] * num_resources, max_demand, allocation)
+
+    path = os.path.join(tempfile.mkdtemp(), "state.bank")
+    t_save, _ = _time_call(lambda: banker.save(path), repeat=1)
+    print(f"state: {num_processes} x {num_resources}, file {os.path.getsize(path) / 2**20:.1f} MiB, saved in {t_save:.3f}s")
+
+    runs = [("compact, mmap", lambda: CompactBankersAlgorithm.load(path, mmap=True)),
+            ("compact, read", lambda: CompactBankersAlgorithm.load(path, mmap=False))]
+    if np is not None:
+        runs.append(("numpy, mmap", lambda: NumpyBankersAlgorithm.load(path, mmap=True)))
+    if num_processes <= list_limit:
+        runs.append(("lists, mmap", lambda: BankersAlgorithm.load(path, mmap=True)))
+    for label, load in runs:
+        elapsed, loaded = _time_call(load, repeat=1)
+        t_row, _ = _time_call(lambda: loaded.need[num_processes - 1], repeat=1)
+        print(f"{label:>14}: load {elapsed:>9.4f}s   first need row {t_row * 1e6:>8.1f}us")
+        del loaded
+    os.remove(path)
+
+
+def bench_detection(num_processes, num_resources, num_events, detect_every):
+    """
+    Total CPU time of per-request avoidance against detection mode (O(m)
+    admission plus a detection pass every detect_every events) on the same
+    synthetic trace. Parsing the trace is not timed.
+    """
+    path = os.path.join(tempfile.mkdtemp(), "trace.jsonl")
+    generate_trace(path, num_events, num_processes, num_resources, seed=4)
+    events = [event for event, _ in iter_events(path)]
+    os.remove(path)
+    init = events[0]
+
+    print(f"trace: {len(events) - 1} events, {num_processes} processes x {num_resources} resources")
+    print(f"{'mode':>10} {'cpu (s)':>10} {'events/s':>10} {'granted':>8} {'passes':>7} {'max deadlocked':>15}")
+    for label, every in (("avoidance", None), ("detection", detect_every)):
+        banker = BankersAlgorithm(init["available"], init["max_demand"], init["allocation"], strategy="incremental")
+        if every is not None:
+            banker.enable_detection(every=every)
+        requests = granted = worst = 0
+
+        start = time.process_time()
+        for event in events[1:]:
+            op = event["op"]
+            if op == "request":
+                success, _ = banker.request_resources(event["pid"], event["vector"])
+                requests += 1
+                granted += success
+            elif op == "release":
+                banker.release_resources(event["pid"], event["vector"])
+            else:
+                banker.complete_process(event["pid"])
+            worst = max(worst, len(banker.deadlocked))
+        cpu = time.process_time() - start
+
+        passes = banker.detection.runs if banker.detection is not None else "-"
+        print(f"{label:>10} {cpu:>10.3f} {(len(events) - 1) / cpu:>10.0f} {granted / max(requests, 1):>8.1%}"
+              f" {passes:>7} {worst:>15}")
+
+
+def _int_list(text):
+    return [int(x) for x in text.split(",")]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Banker's Algorithm benchmarks")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_numpy = sub.add_parser("numpy", help="scan vs. NumPy safety check")
+    p_numpy.add_argument("--sizes", type=_int_list, default=[1000, 10000, 100000])
+    p_numpy.add_argument("--resources", type=int, default=16)
+    p_numpy.add_argument("--scan-limit", type=int, default=10000,
+                         help="largest process count to run the pure-Python scan on")
+
+    p_incr = sub.add_parser("incremental", help="scan vs. sorted-queue incremental safety check")
+    p_incr.add_argument("--sizes", type=_int_list, default=[1000, 10000, 100000])
+    p_incr.add_argument("--resources", type=int, default=16)
+    p_incr.add_argument("--scan-limit", type=int, default=10000)
+
+    p_batch = sub.add_parser("batch", help="batch admission vs. single requests")
+    p_batch.add_argument("--processes", type=int, default=2000)
+    p_batch.add_argument("--resources", type=int, default=16)
+    p_batch.add_argument("--burst", type=int, default=64)
+    p_batch.add_argument("--bursts", type=int, default=50)
+    p_batch.add_argument("--numpy", action="store_true", help="use NumpyBankersAlgorithm")
+
+    p_mem = sub.add_parser("memory", help="memory of list-of-lists vs. flat-buffer state")
+    p_mem.add_argument("--processes", type=int, default=100000)
+    p_mem.add_argument("--resources", type=int, default=32)
+    p_mem.add_argument("--max-value", type=int, default=1000)
+
+    p_fork = sub.add_parser("fork", help="copy-on-write fork vs. rebuilding the banker")
+    p_fork.add_argument("--sizes", type=_int_list, default=[1000, 10000, 100000])
+    p_fork.add_argument("--resources", type=int, default=16)
+
+    p_whatif = sub.add_parser("whatif", help="parallel evaluate_candidates scaling")
+    p_whatif.add_argument("--processes", type=int, default=5000)
+    p_whatif.add_argument("--resources", type=int, default=16)
+    p_whatif.add_argument("--candidates", type=int, default=400)
+    p_whatif.add_argument("--workers", type=_int_list, default=[1, 2, 4, 8])
+
+    p_load = sub.add_parser("load", help="binary state save/load times")
+    p_load.add_argument("--processes", type=int, default=1000000)
+    p_load.add_argument("--resources", type=int, default=8)
+    p_load.add_argument("--list-limit", type=int, default=200000,
+                        help="largest process count to load into the list-of-lists engine")
+
+    p_detect = sub.add_parser("detection", help="avoidance vs. periodic deadlock detection")
+    p_detect.add_argument("--processes", type=int, default=200)
+    p_detect.add_argument("--resources", type=int, default=8)
+    p_detect.add_argument("--events", type=int, default=20000)
+    p_detect.add_argument("--detect-every", type=int, default=1000)
+
+    args = parser.parse_args(argv)
+    if args.command == "numpy":
+        bench_numpy(args.sizes, args.resources, args.scan_limit)
+    elif args.command == "incremental":
+        bench_incremental(args.sizes, args.resources, args.scan_limit)
+    elif args.command == "batch":
+        engine = NumpyBankersAlgorithm if args.numpy else BankersAlgorithm
+        bench_batch(args.processes, args.resources, args.burst, args.bursts, engine)
+    elif args.command == "memory":
+        bench_memory(args.processes, args.resources, args.max_value)
+    elif args.command == "fork":
+        bench_fork(args.sizes, args.resources)
+    elif args.command == "whatif":
+        bench_whatif(args.processes, args.resources, args.candidates, args.workers)
+    elif args.command == "load":
+        bench_load(args.processes, args.resources, args.list_limit)
+    elif args.command == "detection":
+        bench_detection(args.processes, args.resources, args.events, args.detect_every)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,11 @@
 # bankers_gui_multipage.py
 import tkinter as tk
-from tkinter import ttk, messagebox, simpledialog
+from bisect import bisect_right
+from itertools import islice
+from tkinter import ttk, messagebox, simpledialog, filedialog
 
 # You must have your bankers_logic.py file in the same folder
-from bankers_logic import BankersAlgorithm
+from bankers_logic import BankersAlgorithm, CompactBankersAlgorithm
 
 # --- Modern Theme & Colors ---
 BG_COLOR = "#292d3e"
@@ -103,6 +105,7 @@ class SetupPage(tk.Frame):
         tk.Label(sample_frame, text="📊 Use Sample Data", font=FONT_BOLD, bg=FRAME_COLOR, fg=FG_COLOR).pack(pady=10)
         tk.Label(sample_frame, text="Load a pre-configured safe state.", font=FONT_NORMAL, bg=FRAME_COLOR, fg=FG_COLOR, wraplength=200).pack()
         ttk.Button(sample_frame, text="Load Sample & Launch", command=self.load_sample_and_launch).pack(pady=20)
+        ttk.Button(sample_frame, text="Open State File...", command=self.load_file_and_launch).pack()
 
         back_button = ttk.Button(self, text="← Back to Welcome", command=lambda: controller.show_frame("WelcomePage"))
         back_button.pack(pady=50)
@@ -140,13 +143,55 @@ class SetupPage(tk.Frame):
         )
         self.controller.show_frame("DashboardPage")
 
+    def load_file_and_launch(self):
+        path = filedialog.askopenfilename(title="Open State File", filetypes=[
+            ("Banker state", "*.bank"), ("CSV", "*.csv"), ("NumPy archive", "*.npz"), ("All files", "*.*")])
+        if not path: return
+        try:
+            # The compact engine memory-maps .bank files, so large states open instantly;
+            # the incremental check keeps requests fast on them
+            if path.endswith(".csv"):
+                banker = CompactBankersAlgorithm.from_csv(path, strategy="incremental")
+            elif path.endswith(".npz"):
+                banker = CompactBankersAlgorithm.from_numpy(path, strategy="incremental")
+            else:
+                banker = CompactBankersAlgorithm.load(path, strategy="incremental")
+        except (OSError, ValueError, ImportError) as exc:
+            messagebox.showerror("Invalid State File", str(exc))
+            return
+        self.controller.banker_instance = banker
+        self.controller.show_frame("DashboardPage")
+
 class DashboardPage(tk.Frame):
+    # Process tables only materialize this many rows; scrolling rebinds them
+    VISIBLE_ROWS = 20
+    PROCESS_TABLES = ["Allocation", "Max Demand", "Need", "Headroom"]
+    # Safety-trace playback
+    TRACE_LIMIT = 200000
+    PLAY_TICK_MS = 20
+
     def __init__(self, parent, controller):
         tk.Frame.__init__(self, parent, bg=BG_COLOR)
         self.controller = controller
         self.treeviews = {}
+        self.table_frames = {}
+        self.shown_deadlock = []  # deadlocked PIDs last reported in detection mode
         self.is_visualizing = False
 
+        # Windowed rendering state
+        self.first_row = 0       # PID shown in the top slot
+        self.num_slots = 0       # rows materialized in each process table
+        self.row_tags = {}       # PID -> highlight tag, kept across scrolling
+        self.dirty_rows = set()  # PIDs whose rows changed since the last redraw
+        self.window_moved = False
+        self.redraw_job = None
+
+        # Safety-trace playback state
+        self.trace = []
+        self.trace_releases = []  # trace positions of "release" events
+        self.trace_pos = 0
+        self.play_job = None
+
         # --- Layout ---
         top_frame = tk.Frame(self, bg=BG_COLOR)
         top_frame.pack(fill='x', padx=10, pady=10)
@@ -172,13 +217,39 @@ class DashboardPage(tk.Frame):
         self.request_entry = tk.Entry(control_panel, font=FONT_NORMAL)
         self.request_entry.grid(row=2, column=1, padx=10, pady=5)
 
-        ttk.Button(control_panel, text="Submit Request", command=self.submit_request).grid(row=3, columnspan=2, pady=10, sticky='n')
+        ttk.Button(control_panel, text="Submit Request", command=self.submit_request).grid(row=3, column=0, pady=10, sticky='n')
+        ttk.Button(control_panel, text="Release Resources", command=self.submit_release).grid(row=3, column=1, pady=10, sticky='n')
         
         vis_button = ttk.Button(control_panel, text="Visualize Safety Check", command=self.visualize_safety_check)
-        vis_button.grid(row=4, columnspan=2, pady=10, sticky='n')
+        vis_button.grid(row=4, column=0, pady=10, sticky='n')
+
+        # Detection mode: grant whenever available, detect deadlocks after each event
+        self.detection_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(control_panel, text="Deadlock detection mode", variable=self.detection_var,
+                        command=self.toggle_detection).grid(row=4, column=1, pady=10, sticky='n')
+
+        # --- Trace Playback: step, scrub, speed ---
+        playback = tk.Frame(control_panel, bg=FRAME_COLOR)
+        playback.grid(row=5, columnspan=2, padx=10, sticky='ew')
+        ttk.Button(playback, text="<", width=3, command=lambda: self.step_trace(-1)).grid(row=0, column=0)
+        ttk.Button(playback, text="Play/Pause", command=self.toggle_playback).grid(row=0, column=1, padx=5)
+        ttk.Button(playback, text=">", width=3, command=lambda: self.step_trace(1)).grid(row=0, column=2)
+        self.summary_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(playback, text="Summary only", variable=self.summary_var).grid(row=0, column=3, padx=10)
+        self.scrub = ttk.Scale(playback, from_=0, to=0, orient='horizontal', command=self.on_scrub)
+        self.scrub.grid(row=1, column=0, columnspan=4, sticky='ew', pady=5)
+        tk.Label(playback, text="Steps/s:", font=FONT_NORMAL, bg=FRAME_COLOR, fg=FG_COLOR).grid(row=2, column=0, columnspan=2, sticky='w')
+        self.speed_var = tk.DoubleVar(value=2)
+        ttk.Scale(playback, from_=0.5, to=500, orient='horizontal', variable=self.speed_var).grid(row=2, column=2, columnspan=2, sticky='ew')
+        self.step_label = tk.Label(playback, font=("Consolas", 10), bg=FRAME_COLOR, fg=FG_COLOR, anchor='w', justify='left', wraplength=380)
+        self.step_label.grid(row=3, column=0, columnspan=4, sticky='ew')
+        playback.columnconfigure(3, weight=1)
         
+        # Headroom costs safety probes, so it is only computed when asked for
+        ttk.Button(control_panel, text="Compute Headroom", command=self.compute_headroom).grid(row=6, columnspan=2, pady=5)
+
         reset_button = ttk.Button(control_panel, text="Reset & New Setup", command=lambda: controller.show_frame("SetupPage"))
-        reset_button.grid(row=5, columnspan=2, pady=10, sticky='s')
+        reset_button.grid(row=7, columnspan=2, pady=10, sticky='s')
 
 
         # --- Log Panel ---
@@ -188,6 +259,15 @@ class DashboardPage(tk.Frame):
         self.log_text = tk.Text(log_panel, font=("Consolas", 11), bg="#202330", fg=FG_COLOR, wrap='word', state='disabled', relief='flat')
         self.log_text.pack(fill='both', expand=True, padx=5, pady=5)
 
+        # --- Metrics Panel ---
+        metrics_panel = tk.Frame(bottom_frame, bg=FRAME_COLOR)
+        metrics_panel.pack(side='left', fill='both', expand=True, padx=(10, 0))
+        tk.Label(metrics_panel, text="Metrics", font=FONT_BOLD, bg=FRAME_COLOR, fg=FG_COLOR).pack(pady=5)
+        self.metrics_label = tk.Label(metrics_panel, font=("Consolas", 10), bg="#202330", fg=FG_COLOR,
+                                      justify='left', anchor='nw', wraplength=360)
+        self.metrics_label.pack(fill='both', expand=True, padx=5, pady=5)
+        self.metrics_job = None
+
 
        # --- Treeview Tables ---
         style = ttk.Style()
@@ -200,14 +280,15 @@ class DashboardPage(tk.Frame):
         style.configure("Dashboard.TLabelframe", background=BG_COLOR, bordercolor=BG_COLOR)
         style.configure("Dashboard.TLabelframe.Label", font=FONT_BOLD, background=BG_COLOR, foreground=FG_COLOR)
 
-        matrices = ["Allocation", "Max Demand", "Need", "Available"]
+        matrices = ["Allocation", "Max Demand", "Need", "Headroom", "Available"]
         for i, name in enumerate(matrices):
             # CHANGED: Use a LabelFrame which has a text title
             frame = ttk.LabelFrame(matrices_frame, text=name, style="Dashboard.TLabelframe")
+            self.table_frames[name] = frame
             frame.grid(row=0, column=i, padx=10, pady=5, sticky='nsew')
             matrices_frame.columnconfigure(i, weight=1)
             
-            tree = ttk.Treeview(frame, style="Treeview")
+            tree = ttk.Treeview(frame, style="Treeview", height=self.VISIBLE_ROWS)
             self.treeviews[name] = tree
             # CHANGED: Pack inside the new LabelFrame
             tree.pack(fill='both', expand=True, padx=5, pady=5)
@@ -216,9 +297,30 @@ class DashboardPage(tk.Frame):
             tree.tag_configure('wait', background=WAIT_COLOR, foreground='black')
             tree.tag_configure('success', background=SUCCESS_COLOR, foreground='black')
 
+            if name == "Headroom":
+                tree.bind("<<TreeviewSelect>>", self.on_headroom_select)
+            if name in self.PROCESS_TABLES:
+                tree.bind("<MouseWheel>", lambda e: self.scroll_rows(-1 if e.delta > 0 else 1, "units", count=3))
+                tree.bind("<Button-4>", lambda e: self.scroll_rows(-1, "units", count=3))
+                tree.bind("<Button-5>", lambda e: self.scroll_rows(1, "units", count=3))
+
+        # One scrollbar drives all process tables so their rows stay aligned
+        self.scrollbar = ttk.Scrollbar(matrices_frame, orient='vertical', command=self.on_scrollbar)
+        self.scrollbar.grid(row=0, column=len(matrices), sticky='ns', pady=5)
+
     def on_show(self):
+        self.controller.banker_instance.enable_metrics()
         self.refresh_data()
         self.log("Dashboard loaded. System is ready for simulation.")
+        if self.metrics_job is None:
+            self.refresh_metrics()
+
+    def refresh_metrics(self):
+        """Redraws the metrics panel once a second from the banker's counters."""
+        banker = self.controller.banker_instance
+        if banker is not None and banker.metrics is not None:
+            self.metrics_label.config(text="\n".join(banker.metrics.summary_lines(banker)))
+        self.metrics_job = self.after(1000, self.refresh_metrics)
 
     def log(self, message):
         self.log_text.config(state='normal')
@@ -227,39 +329,171 @@ class DashboardPage(tk.Frame):
         self.log_text.config(state='disabled')
 
     def refresh_data(self):
+        """
+        Rebuilds the tables for the current banker: sets up the columns once
+        and materializes VISIBLE_ROWS slot rows per process table. Later
+        changes go through mark_changed() instead.
+        """
         banker = self.controller.banker_instance
         if not banker: return
 
         # Clear old data
         for tree in self.treeviews.values():
             tree.delete(*tree.get_children())
+        if self.redraw_job is not None:
+            self.after_cancel(self.redraw_job)
+            self.redraw_job = None
+        if self.play_job is not None:
+            self.after_cancel(self.play_job)
+            self.play_job = None
+        self.is_visualizing = False
+        self.trace = []
+        self.trace_releases = []
+        self.scrub.config(to=0)
+        self.step_label.config(text="")
+        self.row_tags.clear()
+        self.dirty_rows.clear()
+        self.window_moved = False
+        self.shown_deadlock = []
+
+        # In detection mode the headroom table shows the outstanding requests instead
+        self.detection_var.set(banker.detection is not None)
+        self.table_frames["Headroom"].config(text="Requests" if banker.detection is not None else "Headroom")
 
         # Resource headers (R0, R1...)
         res_headers = [f"R{i}" for i in range(banker.num_resources)]
-
-        # --- Populate Allocation, Max, Need tables ---
-        for name in ["Allocation", "Max Demand", "Need"]:
-            tree = self.treeviews[name]
+        for name, tree in self.treeviews.items():
             tree['columns'] = res_headers
-            tree.heading("#0", text="PID")
+            tree.heading("#0", text="Sys" if name == "Available" else "PID")
             tree.column("#0", width=50, anchor='center')
             for col in res_headers:
                 tree.heading(col, text=col)
                 tree.column(col, width=50, anchor='center')
 
-            matrix = getattr(banker, name.lower().replace(" ", "_"))
-            for i in range(banker.num_processes):
-                tree.insert("", "end", iid=f"{name}_{i}", text=f"P{i}", values=matrix[i])
+        # --- Slot rows for the process tables, filled in by draw_window ---
+        self.num_slots = min(self.VISIBLE_ROWS, banker.num_processes)
+        self.first_row = min(self.first_row, banker.num_processes - self.num_slots)
+        for name in self.PROCESS_TABLES:
+            for k in range(self.num_slots):
+                self.treeviews[name].insert("", "end", iid=f"{name}_slot{k}")
 
-        # --- Populate Available table ---
-        tree = self.treeviews["Available"]
-        tree['columns'] = res_headers
-        tree.heading("#0", text="Sys")
-        tree.column("#0", width=50, anchor='center')
-        for col in res_headers:
-            tree.heading(col, text=col)
-            tree.column(col, width=50, anchor='center')
-        tree.insert("", "end", text="Total", values=banker.available)
+        # --- Available table ---
+        self.treeviews["Available"].insert("", "end", iid="Available_total", text="Total")
+        self.draw_window()
+
+    def draw_window(self):
+        """Fills every slot row from the banker for the PIDs currently in view."""
+        banker = self.controller.banker_instance
+        for k in range(self.num_slots):
+            self.draw_row(banker, self.first_row + k)
+        self.treeviews["Available"].item("Available_total", values=list(banker.available))
+        n = banker.num_processes
+        if n:
+            self.scrollbar.set(self.first_row / n, (self.first_row + self.num_slots) / n)
+
+    def draw_row(self, banker, pid, tables=None):
+        k = pid - self.first_row
+        tags = self.row_tags.get(pid, ())
+        for name in tables or self.PROCESS_TABLES:
+            if name == "Headroom":
+                # Only cached headroom is shown here; show_headroom computes a row
+                values = list(banker.requests[pid]) if banker.detection is not None else \
+                    ["…" if v is None else v for v in banker.cached_max_grantable(pid)]
+            else:
+                values = list(getattr(banker, name.lower().replace(" ", "_"))[pid])
+            self.treeviews[name].item(f"{name}_slot{k}", text=f"P{pid}", values=values, tags=tags)
+
+    def mark_changed(self, pid=None):
+        """
+        Records that a process's row (and Available) changed and schedules a
+        single idle-time redraw, so a burst of requests costs one redraw.
+        """
+        if pid is not None:
+            self.dirty_rows.add(pid)
+        if self.redraw_job is None:
+            self.redraw_job = self.after_idle(self.flush_redraw)
+
+    def flush_redraw(self):
+        """Applies the changes collected by mark_changed to the visible rows only."""
+        self.redraw_job = None
+        banker = self.controller.banker_instance
+        if not banker: return
+        if self.window_moved:
+            self.window_moved = False
+            self.dirty_rows.clear()
+            self.draw_window()
+            return
+
+        visible = range(self.first_row, self.first_row + self.num_slots)
+        for pid in self.dirty_rows:
+            if pid in visible:
+                self.draw_row(banker, pid, ["Allocation", "Max Demand", "Need"])
+        self.dirty_rows.clear()
+        # Available moved, so any visible headroom row may have changed
+        for pid in visible:
+            self.draw_row(banker, pid, ["Headroom"])
+        self.treeviews["Available"].item("Available_total", values=list(banker.available))
+
+    def compute_headroom(self):
+        try:
+            self.show_headroom(int(self.pid_entry.get()))
+        except (ValueError, IndexError):
+            messagebox.showerror("Invalid Process ID", "Please enter a valid Process ID.")
+
+    def on_headroom_select(self, event):
+        """Computes the headroom of the row clicked in the Headroom table."""
+        selection = self.treeviews["Headroom"].selection()
+        if not selection: return
+        self.treeviews["Headroom"].selection_remove(*selection)
+        self.show_headroom(self.first_row + int(selection[0].rsplit("slot", 1)[1]))
+
+    def show_headroom(self, pid):
+        """
+        Computes one process's headroom on request. Each entry costs safety
+        probes, which take seconds on large states, so the dashboard never
+        computes headroom on its own.
+        """
+        banker = self.controller.banker_instance
+        if not banker: return
+        if banker.detection is not None:
+            self.log("Headroom is not computed in detection mode; the table shows outstanding requests.")
+            return
+        if not 0 <= pid < banker.num_processes:
+            raise IndexError(pid)
+        headroom = banker.max_grantable(pid)
+        self.log(f"Headroom of P{pid}: {headroom} (largest safe grant of each resource alone)")
+        self.show_row(pid)
+        self.mark_changed(pid)
+
+    def scroll_rows(self, amount, what="units", count=1):
+        banker = self.controller.banker_instance
+        if not banker: return "break"
+        step = self.num_slots if what == "pages" else count
+        self.scroll_to(self.first_row + int(amount) * step)
+        return "break"
+
+    def scroll_to(self, first):
+        banker = self.controller.banker_instance
+        first = max(0, min(first, banker.num_processes - self.num_slots))
+        if first != self.first_row:
+            self.first_row = first
+            self.window_moved = True
+            self.mark_changed()
+
+    def on_scrollbar(self, action, *args):
+        banker = self.controller.banker_instance
+        if not banker: return
+        if action == "moveto":
+            self.scroll_to(int(float(args[0]) * banker.num_processes))
+        else:
+            self.scroll_rows(args[0], args[1])
+
+    def show_row(self, pid):
+        """Scrolls the process tables just enough to bring pid into view."""
+        if pid < self.first_row:
+            self.scroll_to(pid)
+        elif pid >= self.first_row + self.num_slots:
+            self.scroll_to(pid - self.num_slots + 1)
 
     def submit_request(self):
         if self.is_visualizing: return
@@ -267,71 +501,176 @@ class DashboardPage(tk.Frame):
             pid = int(self.pid_entry.get())
             request = list(map(int, self.request_entry.get().split(',')))
             self.log(f"--- P{pid} requesting {request} ---")
-            success, message = self.controller.banker_instance.request_resources(pid, request)
+            banker = self.controller.banker_instance
+            success, message = banker.request_resources(pid, request)
             self.log(message)
             if success:
-                self.refresh_data()
+                if self.trace:
+                    self.discard_trace()
+                self.mark_changed(pid)
+            elif banker.detection is not None:
+                self.mark_changed(pid)  # the denied request is now outstanding
+            self.show_deadlock()
         except (ValueError, AttributeError):
             messagebox.showerror("Invalid Request", "Please enter a valid Process ID and comma-separated request vector.")
-    
-    def visualize_safety_check(self):
-        if self.is_visualizing: return
-        self.is_visualizing = True
-        self.log("--- Starting Safety Algorithm Visualization ---")
-        self.refresh_data() # Reset colors
 
+    def submit_release(self):
+        if self.is_visualizing: return
+        try:
+            pid = int(self.pid_entry.get())
+            release = list(map(int, self.request_entry.get().split(',')))
+            self.log(f"--- P{pid} releasing {release} ---")
+            success, message = self.controller.banker_instance.release_resources(pid, release)
+            self.log(message)
+            if success:
+                if self.trace:
+                    self.discard_trace()
+                self.mark_changed(pid)
+            self.show_deadlock()
+        except (ValueError, AttributeError):
+            messagebox.showerror("Invalid Release", "Please enter a valid Process ID and comma-separated release vector.")
+    
+    def toggle_detection(self):
         banker = self.controller.banker_instance
-        work = list(banker.available)
-        finish = [False] * banker.num_processes
-        safe_sequence = []
-        
-        self.after(500, self.visualization_step, work, finish, safe_sequence, 0)
-        
-    def visualization_step(self, work, finish, safe_sequence, round_num):
+        if not banker: return
+        if self.detection_var.get():
+            banker.enable_detection(every=1)
+            self.log("Detection mode: requests are granted whenever resources are available; "
+                     "deadlocks are detected after every request and release.")
+        else:
+            banker.disable_detection()
+            self.log("Avoidance mode: every request is checked for safety.")
+        self.refresh_data()
+
+    def show_deadlock(self):
+        """Highlights the deadlocked set reported by the detector and logs changes to it."""
         banker = self.controller.banker_instance
+        deadlocked = list(banker.deadlocked) if banker.detection is not None else []
+        if not deadlocked and not self.shown_deadlock: return
+        for pid in self.shown_deadlock:
+            self.row_tags.pop(pid, None)
+        for pid in deadlocked:
+            self.row_tags[pid] = ('wait',)
+        if deadlocked != self.shown_deadlock:
+            if deadlocked:
+                self.log(f"DEADLOCK DETECTED among {', '.join(f'P{i}' for i in deadlocked)}.")
+            else:
+                self.log("Deadlock resolved.")
+            self.shown_deadlock = deadlocked
+        self.window_moved = True
+        self.mark_changed()
 
-        if len(safe_sequence) == banker.num_processes:
-            self.log(f"SUCCESS! Safe sequence found: {' -> '.join(map(str, safe_sequence))}")
-            self.is_visualizing = False
+    def visualize_safety_check(self):
+        if self.is_visualizing: return
+        banker = self.controller.banker_instance
+        self.discard_trace()
+
+        if self.summary_var.get():
+            # Summary only: no per-process animation or log lines
+            safe, sequence = banker.is_safe_state()
+            if safe:
+                self.log(f"SUCCESS! Safe sequence found: {' -> '.join(f'P{i}' for i in sequence)}")
+            else:
+                self.log("DEADLOCK DETECTED! No process can be allocated resources. System is in an UNSAFE state.")
             return
 
-        found_in_round = False
-        for i in range(banker.num_processes):
-            if not finish[i]:
-                # Highlight current process being checked
-                for name in ["Allocation", "Max Demand", "Need"]:
-                     self.treeviews[name].item(f"{name}_{i}", tags=('wait',))
-
-                self.log(f"Checking P{i}: Need={banker.need[i]} <= Work={work}?")
-                
-                if all(banker.need[i][j] <= work[j] for j in range(banker.num_resources)):
-                    self.log(f"--> P{i} can execute. Releasing its resources.")
-                    
-                    for j in range(banker.num_resources):
-                        work[j] += banker.allocation[i][j]
-                    
-                    finish[i] = True
-                    safe_sequence.append(f"P{i}")
-
-                    # Highlight success
-                    for name in ["Allocation", "Max Demand", "Need"]:
-                        self.treeviews[name].item(f"{name}_{i}", tags=('success',))
-                    
-                    found_in_round = True
-                    # Schedule the next check after a delay
-                    self.after(1500, self.visualization_step, work, finish, safe_sequence, 0)
-                    return
-                else:
-                    self.log(f"--> P{i} must wait. Need > Work.")
-                    # Remove highlight after a delay
-                    self.after(750, lambda p=i: [self.treeviews[name].item(f"{name}_{p}", tags=()) for name in ["Allocation", "Max Demand", "Need"]])
-
-        if not found_in_round:
-            self.log(f"DEADLOCK DETECTED! No process can be allocated resources. System is in an UNSAFE state.")
-            for i in range(banker.num_processes):
-                if not finish[i]:
-                     for name in ["Allocation", "Max Demand", "Need"]:
-                          self.treeviews[name].item(f"{name}_{i}", tags=('wait',)) # Highlight remaining processes in red/yellow
+        # Precompute the whole trace once; playback only indexes into it
+        # Traced with the scan whatever the engine's strategy, so waiting processes show up
+        self.trace = list(islice(banker.safety_trace("scan"), self.TRACE_LIMIT))
+        if len(self.trace) == self.TRACE_LIMIT:
+            self.log(f"Trace truncated at {self.TRACE_LIMIT} steps; use 'Summary only' for the verdict.")
+        self.trace_releases = [k for k, (kind, _, _) in enumerate(self.trace) if kind == "release"]
+        self.scrub.config(to=len(self.trace) - 1)
+        self.log(f"--- Safety trace: {len(self.trace)} steps, {len(self.trace_releases)} releases ---")
+        self.seek(0)
+        self.toggle_playback()
+
+    def discard_trace(self):
+        """Stops playback and drops the trace, e.g. after the state changed."""
+        if self.play_job is not None:
+            self.after_cancel(self.play_job)
+            self.play_job = None
+        self.is_visualizing = False
+        self.trace = []
+        self.trace_releases = []
+        self.trace_pos = 0
+        self.scrub.config(to=0)
+        self.step_label.config(text="")
+        self.row_tags.clear()
+        self.window_moved = True
+        self.mark_changed()
+
+    def seek(self, pos):
+        """
+        Shows the trace as of step pos: released processes highlighted as
+        successful, the process under test (or the deadlocked ones) as waiting.
+        """
+        if not self.trace: return
+        pos = max(0, min(pos, len(self.trace) - 1))
+        self.trace_pos = pos
+        kind, subject, work = self.trace[pos]
+
+        released = self.trace_releases[:bisect_right(self.trace_releases, pos)]
+        self.row_tags = {self.trace[k][1]: ('success',) for k in released}
+        if kind in ("check", "wait"):
+            self.row_tags[subject] = ('wait',)
+            self.show_row(subject)
+        elif kind == "release":
+            self.show_row(subject)
+        elif kind == "deadlock":
+            for pid in subject:
+                self.row_tags[pid] = ('wait',)
+        self.window_moved = True
+        self.mark_changed()
+
+        self.scrub.set(pos)
+        self.step_label.config(text=f"Step {pos + 1}/{len(self.trace)}: {self.describe_step(kind, subject, work)}")
+        if pos == len(self.trace) - 1 and kind in ("safe", "deadlock"):
+            self.log(self.describe_step(kind, subject, work))
+
+    def describe_step(self, kind, subject, work):
+        banker = self.controller.banker_instance
+        if kind == "check":
+            return f"Checking P{subject}: Need={list(banker.need[subject])} <= Work={list(work)}?"
+        if kind == "wait":
+            return f"P{subject} must wait. Need > Work."
+        if kind == "release":
+            return f"P{subject} can execute. Releasing its resources. Work={list(work)}"
+        if kind == "deadlock":
+            return "DEADLOCK DETECTED! No process can be allocated resources. System is in an UNSAFE state."
+        return f"SUCCESS! Safe sequence found: {' -> '.join(f'P{i}' for i in subject)}"
+
+    def step_trace(self, delta):
+        if self.play_job is not None:
+            self.toggle_playback()
+        self.seek(self.trace_pos + delta)
+
+    def on_scrub(self, value):
+        pos = int(float(value))
+        if pos != self.trace_pos:
+            self.seek(pos)
+
+    def toggle_playback(self):
+        if self.play_job is not None:
+            self.after_cancel(self.play_job)
+            self.play_job = None
+            self.is_visualizing = False
+        elif self.trace and self.trace_pos < len(self.trace) - 1:
+            self.is_visualizing = True
+            self.play_job = self.after(self.PLAY_TICK_MS, self.play_tick)
+
+    def play_tick(self):
+        """
+        Advances playback by as many steps as the speed setting (steps per
+        second) allots to one tick; only the step landed on is drawn.
+        """
+        steps = max(1, round(self.speed_var.get() * self.PLAY_TICK_MS / 1000))
+        delay = max(self.PLAY_TICK_MS, int(1000 / self.speed_var.get()))
+        self.seek(self.trace_pos + steps)
+        if self.trace_pos < len(self.trace) - 1:
+            self.play_job = self.after(delay, self.play_tick)
+        else:
+            self.play_job = None
             self.is_visualizing = False
 
 if __name__ == "__main__":
@@ -1,89 +1,1650 @@
 # bankers_logic.py
 
+import copy
+import csv
+import heapq
+import mmap as _mmap
+import os
+import struct
+import sys
+import time
+from array import array
+from multiprocessing import Pool, shared_memory
+
+from bankers_metrics import BankerMetrics
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional; only NumpyBankersAlgorithm needs it
+    np = None
+
+
+class PendingRequest:
+    """A request queued by BankersAlgorithm until resources are released."""
+    __slots__ = ("process_id", "request", "priority", "on_grant", "seq", "blocked_on", "retry_at")
+
+    def __init__(self, process_id, request, priority=0, on_grant=None):
+        self.process_id = process_id
+        self.request = list(request)
+        self.priority = priority
+        self.on_grant = on_grant
+        self.seq = None
+        self.blocked_on = None
+        self.retry_at = 0
+
+
+class DetectionSchedule:
+    """When BankersAlgorithm runs its deadlock detector in detection mode."""
+    __slots__ = ("every", "interval", "on_deadlock", "events", "last_run", "runs")
+
+    def __init__(self, every=None, interval=None, on_deadlock=None):
+        self.every = every
+        self.interval = interval
+        self.on_deadlock = on_deadlock
+        self.events = 0
+        self.last_run = time.monotonic()
+        self.runs = 0
+
+
+class FlatMatrix:
+    """
+    Row-major int64 matrix stored in one contiguous buffer. Indexing a row
+    returns a zero-copy memoryview, so matrix[i][j] reads and writes work
+    like a list of lists at 8 bytes per cell.
+    """
+    __slots__ = ("rows", "cols", "_buf", "_view")
+
+    def __init__(self, rows, cols, buf=None):
+        """
+        :param rows: Number of rows.
+        :param cols: Number of columns.
+        :param buf: Optional buffer of rows * cols int64 values to wrap;
+                    a zero-filled array('q') is allocated when omitted.
+        """
+        self.rows = rows
+        self.cols = cols
+        self._buf = array('q', bytes(8 * rows * cols)) if buf is None else buf
+        self._view = memoryview(self._buf).cast('B').cast('q')
+        if len(self._view) != rows * cols:
+            raise ValueError(f"Buffer holds {len(self._view)} values, expected {rows} x {cols}.")
+
+    @classmethod
+    def from_rows(cls, rows, cols):
+        """Packs an iterable of rows (each of length cols) into a new FlatMatrix."""
+        buf = array('q')
+        count = 0
+        for row in rows:
+            if len(row) != cols:
+                raise ValueError(f"Row {count} has {len(row)} values, expected {cols}.")
+            buf.extend(row)
+            count += 1
+        return cls(count, cols, buf)
+
+    def __len__(self):
+        return self.rows
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += self.rows
+        if not 0 <= i < self.rows:
+            raise IndexError("FlatMatrix row index out of range")
+        start = i * self.cols
+        return self._view[start:start + self.cols]
+
+    def __iter__(self):
+        for i in range(self.rows):
+            yield self[i]
+
+    def tolist(self):
+        return [row.tolist() for row in self]
+
+    @property
+    def nbytes(self):
+        return self._view.nbytes
+
+
+class CowMatrix:
+    """
+    Copy-on-write overlay used by BankersAlgorithm.fork(). Reads fall
+    through to the shared base matrix; writable(i) copies row i into this
+    overlay first. Wrapping another CowMatrix flattens it, so lookups never
+    walk a chain of overlays. Overlays over the same base share a count of
+    the live ones; once only one is left, fold() writes its rows back.
+    """
+    __slots__ = ("_base", "_rows", "_owned", "_shares")
+
+    def __init__(self, base):
+        if isinstance(base, CowMatrix):
+            self._base = base._base
+            self._rows = dict(base._rows)
+            self._shares = base._shares
+        else:
+            self._base = base
+            self._rows = {}
+            self._shares = [0]
+        self._owned = set()
+        self._shares[0] += 1
+
+    def __len__(self):
+        return len(self._base)
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += len(self._base)
+        row = self._rows.get(i)
+        return self._base[i] if row is None else row
+
+    def __iter__(self):
+        for i in range(len(self._base)):
+            yield self[i]
+
+    def writable(self, i):
+        """
+        Returns row i owned by this overlay, copying it on first write: a
+        list over a list of lists, an array('q') over a flat buffer.
+        """
+        if i < 0:
+            i += len(self._base)
+        if i not in self._owned:
+            self._rows[i] = list(self[i]) if isinstance(self._base, list) else array('q', self[i])
+            self._owned.add(i)
+        return self._rows[i]
+
+    def tolist(self):
+        return [list(row) for row in self]
+
+    def __eq__(self, other):
+        try:
+            return len(self) == len(other) and all(list(a) == list(b) for a, b in zip(self, other))
+        except TypeError:
+            return NotImplemented
+
+    __hash__ = None
+
+    def release(self):
+        """Marks this overlay as dropped; it must not be used afterwards."""
+        self._shares[0] -= 1
+
+    @property
+    def folds(self):
+        """True once no other live overlay shares the base."""
+        return self._shares[0] == 1
+
+    def fold(self):
+        """
+        Writes every row this overlay holds into the base and returns the
+        base, which replaces the overlay. Only valid when folds is True.
+        """
+        base = self._base
+        for i, row in self._rows.items():
+            if isinstance(base, list):
+                base[i] = row
+            else:
+                base[i][:] = row
+        self._rows = {}
+        self._owned = set()
+        self.release()
+        return base
+
+
+class LazyNeedMatrix:
+    """
+    Need matrix derived on demand: row i is max_demand[i] - allocation[i],
+    computed into a flat buffer the first time it is read. Used for states
+    wrapped around external buffers (a memory-mapped state file, shared
+    memory), so wrapping them costs no O(n * m) pass up front. The buffers
+    are anonymous memory maps, whose zero pages the OS only provides once
+    a row on them is touched. Rows are zero-copy memoryviews, like
+    FlatMatrix rows.
+    """
+    __slots__ = ("_max_demand", "_allocation", "_flat", "_ready")
+
+    def __init__(self, max_demand, allocation):
+        self._max_demand = max_demand
+        self._allocation = allocation
+        rows, cols = len(max_demand), max_demand.cols
+        self._flat = FlatMatrix(rows, cols, _zero_buffer(8 * rows * cols))
+        self._ready = _zero_buffer(rows)
+
+    def __len__(self):
+        return len(self._flat)
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += len(self._flat)
+        row = self._flat[i]
+        if not self._ready[i]:
+            max_i = self._max_demand[i]
+            alloc_i = self._allocation[i]
+            for j in range(len(row)):
+                row[j] = max_i[j] - alloc_i[j]
+            self._ready[i] = 1
+        return row
+
+    def __iter__(self):
+        for i in range(len(self._flat)):
+            yield self[i]
+
+    def tolist(self):
+        return [row.tolist() for row in self]
+
+
+def _zero_buffer(size):
+    """A zero-filled writable buffer whose pages are only committed when written."""
+    # mmap cannot map zero bytes
+    return _mmap.mmap(-1, size) if size else bytearray()
+
+
+# Binary state file: a header, then little-endian int64 blocks
+# [available (m) | max_demand (n * m) | allocation (n * m)], rows in order.
+STATE_MAGIC = b"BANKERS\x00"
+STATE_VERSION = 1
+_STATE_HEADER = struct.Struct("<8sIIQQ")  # magic, version, flags (reserved), processes, resources
+
+
+def _write_matrix(f, matrix):
+    """Writes matrix rows as little-endian int64, without per-row copies where possible."""
+    if isinstance(matrix, FlatMatrix) and sys.byteorder == "little":
+        f.write(matrix._view)
+    elif np is not None and isinstance(matrix, np.ndarray):
+        f.write(np.ascontiguousarray(matrix, dtype="<i8").tobytes())
+    else:
+        for row in matrix:
+            block = array('q', [int(x) for x in row])
+            if sys.byteorder != "little":
+                block.byteswap()
+            f.write(block.tobytes())
+
+
+def _check_blocks(values, num_processes, num_resources, source):
+    """
+    Checks an int64 memoryview in the state file layout for the bounds
+    from_csv checks row by row: available >= 0 and 0 <= allocation <=
+    max_demand. Runs vectorized when NumPy is installed.
+    """
+    m, cells = num_resources, num_processes * num_resources
+    if np is not None:
+        flat = np.frombuffer(values, dtype=np.int64)
+        negative = bool((flat[:m] < 0).any())
+        max_demand = flat[m:m + cells].reshape(-1, m)
+        allocation = flat[m + cells:m + 2 * cells].reshape(-1, m)
+        bad = np.flatnonzero(((allocation < 0) | (allocation > max_demand)).any(axis=1))
+        first = int(bad[0]) if bad.size else None
+    else:
+        negative = any(values[j] < 0 for j in range(m))
+        first = next((i for i in range(num_processes)
+                      if any(not 0 <= values[m + cells + i * m + j] <= values[m + i * m + j] for j in range(m))), None)
+    if negative:
+        raise ValueError(f"{source}: available needs non-negative counts.")
+    if first is not None:
+        raise ValueError(f"{source}: process {first}: allocation must be non-negative and within max_demand.")
+
+
+def _writable_row(matrix, i):
+    return matrix.writable(i) if isinstance(matrix, CowMatrix) else matrix[i]
+
+
 class BankersAlgorithm:
-    def __init__(self, available, max_demand, allocation):
+    # Safety-check implementations selectable through the `strategy` argument.
+    SAFETY_STRATEGIES = {
+        "scan": "_scan_safe_state",
+        "incremental": "_incremental_safe_state",
+    }
+    DEFAULT_STRATEGY = "scan"
+
+    def __init__(self, available, max_demand, allocation, strategy=None, queue_policy="fifo"):
         """
         Initializes the Banker's Algorithm state.
         :param available: A list of available instances for each resource.
         :param max_demand: A 2D list representing the maximum resource demand of each process.
         :param allocation: A 2D list representing the current resource allocation for each process.
+                           max_demand may be None when processes cannot declare their claims;
+                           such a banker must run in detection mode (see enable_detection).
+        :param strategy: Name of the safety-check algorithm (see SAFETY_STRATEGIES).
+        :param queue_policy: Order in which waiting requests are retried, "fifo" or "priority".
+        """
+        self.strategy = self._check_strategy(strategy)
+        # Undeclared claims start at the allocation and grow with it
+        self.claims_declared = max_demand is not None
+        if max_demand is None:
+            max_demand = [list(row) for row in allocation]
+        self._init_matrices(available, max_demand, allocation)
+
+        # Last known safe sequence, re-validated before running a full search
+        self._certificate = None
+        self.certificate_hits = 0
+        self.certificate_misses = 0
+        # Safe sequence found by read-only probes (max_grantable), kept apart
+        # from the certificate and counters of real requests
+        self._probe_certificate = None
+
+        # Queue of requests waiting for resources, indexed per resource type
+        if queue_policy not in ("fifo", "priority"):
+            raise ValueError("queue_policy must be 'fifo' or 'priority'.")
+        self.queue_policy = queue_policy
+        self._reset_queue()
+
+        # Bumped on every net state change (grant, release, completion, recorded
+        # detection-mode request), not on rolled-back tentative allocations;
+        # commit() uses it to detect a stale parent
+        self._version = 0
+        self._parent = None
+        self._parent_version = None
+
+        # Cached max_grantable rows; None marks an entry a mutation invalidated
+        self._headroom = {}
+
+        # Instrumentation is off (None) until enable_metrics() is called.
+        # Safety strategies leave (passes, processes scanned) in _last_check,
+        # and after an unsafe verdict (leftover processes, work) in _last_unsafe.
+        self.metrics = None
+        self._last_check = (0, 0)
+        self._last_unsafe = None
+
+        # Detection mode is off (None) until enable_detection() is called.
+        # requests holds each blocked process's outstanding request.
+        self.detection = None
+        self.requests = None
+        self.deadlocked = []
+
+    def enable_metrics(self):
+        """
+        Starts recording latency histograms, scan counts and request outcomes.
+        :return: The BankerMetrics object being filled in.
+        """
+        if self.metrics is None:
+            self.metrics = BankerMetrics()
+        return self.metrics
+
+    def disable_metrics(self):
+        self.metrics = None
+
+    def enable_detection(self, every=None, interval=None, on_deadlock=None):
         """
+        Switches from avoidance to detection mode: requests are granted
+        whenever Available allows (O(m), no safety check) and a deadlock
+        detection pass runs after every `every` requests/releases, or on
+        the first such event once `interval` seconds have passed.
+        :param every: Events between detection passes.
+        :param interval: Seconds between detection passes.
+        :param on_deadlock: Optional callback(pids) for a non-empty deadlocked set.
+        """
+        if every is None and interval is None:
+            raise ValueError("Give a detection interval in events (every) and/or seconds (interval).")
+        self.detection = DetectionSchedule(every, interval, on_deadlock)
+        if self.requests is None:
+            self.requests = self._new_matrix()
+
+    def disable_detection(self):
+        """Returns to per-request avoidance; outstanding requests are forgotten."""
+        if not self.claims_declared:
+            raise ValueError("Avoidance needs declared claims; a banker built with max_demand=None "
+                             "must stay in detection mode.")
+        self.detection = None
+        self.requests = None
+        self.deadlocked = []
+
+    def _new_matrix(self):
+        return [[0] * self.num_resources for _ in range(self.num_processes)]
+
+    def _matrix_names(self):
+        return ("max_demand", "allocation", "need") if self.requests is None else \
+            ("max_demand", "allocation", "need", "requests")
+
+    def _init_matrices(self, available, max_demand, allocation):
         self.num_processes = len(max_demand)
         self.num_resources = len(available)
         
+        # Copy every row so the caller's lists are never mutated through us
         self.available = list(available)
-        self.max_demand = list(max_demand)
-        self.allocation = list(allocation)
+        self.max_demand = [list(row) for row in max_demand]
+        self.allocation = [list(row) for row in allocation]
         
         # Calculate the need matrix
         self.need = [[self.max_demand[i][j] - self.allocation[i][j] 
                       for j in range(self.num_resources)] 
                      for i in range(self.num_processes)]
 
+    def _reset_queue(self):
+        self._waiters = {}
+        self._waiting_on = [set() for _ in range(self.num_resources)]
+        self._next_waiter_seq = 0
+        self._units_released = 0
+
+    def _check_strategy(self, strategy):
+        strategy = strategy or self.DEFAULT_STRATEGY
+        if strategy not in self.SAFETY_STRATEGIES:
+            raise ValueError(f"Unknown safety strategy '{strategy}'. "
+                             f"Choose one of: {', '.join(self.SAFETY_STRATEGIES)}.")
+        return strategy
+
+    def save(self, path):
+        """
+        Writes available, max_demand and allocation to a binary state file
+        (see STATE_MAGIC). need is not stored and queued requests are not saved.
+        :param path: Destination file path.
+        """
+        with open(path, "wb") as f:
+            f.write(_STATE_HEADER.pack(STATE_MAGIC, STATE_VERSION, 0, self.num_processes, self.num_resources))
+            _write_matrix(f, [self.available])
+            _write_matrix(f, self.max_demand)
+            _write_matrix(f, self.allocation)
+
+    @classmethod
+    def load(cls, path, mmap=True, strategy=None):
+        """
+        Loads a state file written by save().
+        :param path: Path of the state file.
+        :param mmap: Read the file through a private copy-on-write memory map
+                     instead of reading it into memory. CompactBankersAlgorithm
+                     wraps the mapping without copying and derives need lazily,
+                     so the only pass over the data is the bounds check; the
+                     other engines convert the data into their own matrices.
+        :param strategy: Safety-check strategy for the new banker.
+        :return: A new banker of this class. Counts outside available >= 0
+                 and 0 <= allocation <= max_demand raise ValueError.
+        """
+        with open(path, "rb") as f:
+            header = f.read(_STATE_HEADER.size)
+            if len(header) < _STATE_HEADER.size or header[:8] != STATE_MAGIC:
+                raise ValueError(f"{path} is not a banker state file.")
+            _, version, _, num_processes, num_resources = _STATE_HEADER.unpack(header)
+            if version != STATE_VERSION:
+                raise ValueError(f"Unsupported state file version {version} (expected {STATE_VERSION}).")
+            expected = _STATE_HEADER.size + 8 * (num_resources + 2 * num_processes * num_resources)
+            if os.fstat(f.fileno()).st_size != expected:
+                raise ValueError(f"{path} is truncated or has trailing data.")
+
+            if mmap and sys.byteorder == "little":
+                data = _mmap.mmap(f.fileno(), 0, access=_mmap.ACCESS_COPY)
+            else:
+                data = bytearray(header) + f.read()
+
+        values = memoryview(data)[_STATE_HEADER.size:]
+        if sys.byteorder != "little":
+            swapped = array('q')
+            swapped.frombytes(values)
+            swapped.byteswap()
+            values = swapped
+        values = memoryview(values).cast('B').cast('q')
+        _check_blocks(values, num_processes, num_resources, path)
+        return cls._from_blocks(values, num_processes, num_resources, strategy)
+
+    @classmethod
+    def from_csv(cls, path, strategy=None):
+        """
+        Imports a state from CSV. One row starts with "available" followed by
+        the m available counts; every other row is "<pid>,<m max_demand
+        values>,<m allocation values>", with PIDs 0..n-1 in order. Blank lines,
+        lines starting with "#" and a header row starting with "process" are
+        skipped. Rows of the wrong width, PIDs out of order and counts outside
+        0 <= allocation <= max_demand raise ValueError.
+        :return: A new banker of this class.
+        """
+        available = None
+        rows = array('q')
+        pids, widths, lines = array('q'), array('q'), array('q')  # per process row, checked below
+        with open(path, newline="") as f:
+            reader = csv.reader(f)
+            for fields in reader:
+                if not fields or fields[0].startswith("#") or fields[0].strip().lower() == "process":
+                    continue
+                if fields[0].strip().lower() == "available":
+                    available = array('q', [int(x) for x in fields[1:]])
+                else:
+                    pids.append(int(fields[0]))
+                    widths.append(len(fields) - 1)
+                    lines.append(reader.line_num)
+                    rows.extend(int(x) for x in fields[1:])
+        if available is None:
+            raise ValueError(f"{path} has no 'available' row.")
+        m = len(available)
+        if not m or min(available) < 0:
+            raise ValueError(f"The 'available' row in {path} needs non-negative counts.")
+        for i, (pid, width, line) in enumerate(zip(pids, widths, lines)):
+            if width != 2 * m:
+                raise ValueError(f"{path}, line {line}: expected {m} max_demand and {m} allocation values, got {width}.")
+            if pid != i:
+                raise ValueError(f"{path}, line {line}: expected process {i}, got {pid}; rows must list PIDs 0..n-1 in order.")
+            start = 2 * m * i
+            if any(not 0 <= rows[start + m + j] <= rows[start + j] for j in range(m)):
+                raise ValueError(f"{path}, line {line}: allocation must be non-negative and within max_demand.")
+
+        # Rows interleave max and allocation; split them into the file layout
+        n = len(rows) // (2 * m)
+        values = array('q', available)
+        for offset in (0, m):
+            for i in range(n):
+                start = 2 * m * i + offset
+                values.extend(rows[start:start + m])
+        return cls._from_blocks(memoryview(values), n, m, strategy)
+
+    @classmethod
+    def from_numpy(cls, path, strategy=None):
+        """
+        Imports a state from a .npz archive holding "available", "max_demand"
+        and "allocation" arrays (as written by numpy.savez).
+        :return: A new banker of this class. Counts outside available >= 0
+                 and 0 <= allocation <= max_demand raise ValueError.
+        """
+        if np is None:
+            raise ImportError("Importing .npz states requires NumPy (pip install numpy).")
+        with np.load(path) as archive:
+            available = np.asarray(archive["available"], dtype=np.int64).ravel()
+            max_demand = np.asarray(archive["max_demand"], dtype=np.int64).reshape(-1, len(available))
+            allocation = np.asarray(archive["allocation"], dtype=np.int64).reshape(max_demand.shape)
+        values = memoryview(np.concatenate([available, max_demand.ravel(), allocation.ravel()])).cast('B').cast('q')
+        _check_blocks(values, max_demand.shape[0], len(available), path)
+        return cls._from_blocks(values, max_demand.shape[0], len(available), strategy)
+
+    @classmethod
+    def _from_blocks(cls, values, num_processes, num_resources, strategy):
+        """Builds a banker from an int64 memoryview in the state file layout."""
+        m, cells = num_resources, num_processes * num_resources
+        available = values[:m].tolist()
+        max_demand = [values[k:k + m].tolist() for k in range(m, m + cells, m)]
+        allocation = [values[k:k + m].tolist() for k in range(m + cells, m + 2 * cells, m)]
+        return cls(available, max_demand, allocation, strategy=strategy)
+
     def is_safe_state(self):
         """
         Checks if the current system state is safe.
         :return: A tuple (boolean, list) indicating if the state is safe and the safe sequence.
         """
-        work = list(self.available)
+        check = getattr(self, self.SAFETY_STRATEGIES[self.strategy])
+        if self.metrics is None:
+            return check()
+        start = time.perf_counter()
+        result = check()
+        self.metrics.record_safety(time.perf_counter() - start, *self._last_check)
+        return result
+
+    def _scan_safe_state(self):
+        """
+        Classic safety check: repeatedly scan from P0 for a process whose
+        Need <= Work. Worst case O(n^2 * m).
+        """
+        for kind, subject, _ in self._scan_steps():
+            pass
+        return (True, subject) if kind == "safe" else (False, [])
+
+    def _scan_steps(self):
+        """
+        Core loop of the classic scan, shared by the "scan" strategy and
+        safety_trace(). Yields the steps described in safety_trace(), ending
+        with a "safe" or "deadlock" step.
+        """
+        work = [int(x) for x in self.available]
         finish = [False] * self.num_processes
         safe_sequence = []
-        
+        snapshot = tuple(work)
+        passes = scanned = 0
+
         while len(safe_sequence) < self.num_processes:
+            passes += 1
             found_process = False
             for i in range(self.num_processes):
                 if not finish[i]:
+                    yield "check", i, snapshot
                     # Check if Need <= Work for process i
-                    if all(self.need[i][j] <= work[j] for j in range(self.num_resources)):
+                    need_i = self.need[i]
+                    if all(need_i[j] <= work[j] for j in range(self.num_resources)):
                         # If so, "release" the resources
+                        alloc_i = self.allocation[i]
                         for j in range(self.num_resources):
-                            work[j] += self.allocation[i][j]
-                        
+                            work[j] += int(alloc_i[j])
+                        snapshot = tuple(work)
+
                         finish[i] = True
                         safe_sequence.append(i)
                         found_process = True
+                        yield "release", i, snapshot
                         break # Find the next process
-            
+                    yield "wait", i, snapshot
+            scanned += i + 1
+
             # If no such process was found in the entire loop, the system is not in a safe state
             if not found_process:
-                return False, []
+                self._last_check = (passes, scanned)
+                leftover = [i for i in range(self.num_processes) if not finish[i]]
+                self._last_unsafe = (leftover, work)
+                yield "deadlock", leftover, snapshot
+                return
+
+        self._last_check = (passes, scanned)
+        yield "safe", safe_sequence, snapshot
+
+    def safety_trace(self, strategy=None):
+        """
+        Generator over the steps of the selected safety strategy, for
+        visualizations; it reaches the same verdict and safe sequence as
+        is_safe_state(). Yields (kind, subject, work) tuples, where work is a
+        tuple snapshot shared until the next release:
+            ("check", pid, work)      Need[pid] is compared against work
+            ("wait", pid, work)       Need[pid] > work, the search moves on
+            ("release", pid, work)    pid can finish; work includes its allocation
+            ("deadlock", pids, work)  no unfinished process can run
+            ("safe", sequence, work)  every process finished
+        The "scan" strategy is traced step by step. The other strategies do
+        not test waiting processes one at a time, so their trace checks and
+        releases the processes in the order the strategy finished them.
+        :param strategy: Strategy to trace instead of the banker's own, e.g.
+                         "scan" for a display that shows every waiting process.
+        """
+        strategy = self.strategy if strategy is None else self._check_strategy(strategy)
+        if strategy == "scan":
+            yield from self._scan_steps()
+            return
+
+        work = [int(x) for x in self.available]
+        snapshot = tuple(work)
+        sequence = self._finish_order(strategy)
+        for i in sequence:
+            yield "check", i, snapshot
+            alloc_i = self.allocation[i]
+            for j in range(self.num_resources):
+                work[j] += int(alloc_i[j])
+            snapshot = tuple(work)
+            yield "release", i, snapshot
+        if len(sequence) < self.num_processes:
+            finished = set(sequence)
+            yield "deadlock", [i for i in range(self.num_processes) if i not in finished], snapshot
+        else:
+            yield "safe", list(sequence), snapshot
+
+    def _finish_order(self, strategy):
+        """The processes the given non-scan strategy lets finish, in order."""
+        return self._incremental_run(self.need)[0]
 
+    def _incremental_safe_state(self):
+        """
+        Safety check driven by per-resource queues of processes sorted by need.
+        Each process counts the resources it is still blocked on; when work[j]
+        grows only the newly satisfied prefix of queue j is visited, so a check
+        costs O(n * m * log n). Runnable processes are taken lowest PID first,
+        which yields the same sequence as the scan.
+        """
+        safe_sequence, work = self._incremental_run(self.need)
+        if len(safe_sequence) < self.num_processes:
+            finished = set(safe_sequence)
+            self._last_unsafe = ([i for i in range(self.num_processes) if i not in finished], work)
+            return False, []
         return True, safe_sequence
 
-    def request_resources(self, process_id, request):
+    def _incremental_run(self, demand):
+        """
+        Core of the incremental check, parameterized by the demand matrix.
+        :return: A tuple (sequence, work): the processes that could finish, in
+                 order, and the work vector once no further process can run.
+        """
+        n, m = self.num_processes, self.num_resources
+        work = list(self.available)
+        blocked = [0] * n
+        queues = []
+        heads = []
+        need_rows = [demand[i] for i in range(n)]
+
+        for j in range(m):
+            queue = sorted((need_rows[i][j], i) for i in range(n))
+            head = 0
+            while head < n and queue[head][0] <= work[j]:
+                head += 1
+            for k in range(head, n):
+                blocked[queue[k][1]] += 1
+            queues.append(queue)
+            heads.append(head)
+
+        ready = [i for i in range(n) if blocked[i] == 0]
+        heapq.heapify(ready)
+        safe_sequence = []
+
+        while ready:
+            i = heapq.heappop(ready)
+            safe_sequence.append(i)
+            alloc_i = self.allocation[i]
+            for j in range(m):
+                amount = alloc_i[j]
+                if not amount:
+                    continue
+                work[j] += amount
+                # Unblock every process whose need for resource j is now satisfied
+                queue, head = queues[j], heads[j]
+                while head < n and queue[head][0] <= work[j]:
+                    pid = queue[head][1]
+                    blocked[pid] -= 1
+                    if blocked[pid] == 0:
+                        heapq.heappush(ready, pid)
+                    head += 1
+                heads[j] = head
+
+        # One pass; "scanned" counts the queue entries visited
+        self._last_check = (1, sum(heads))
+        return safe_sequence, work
+
+    def _blocking_resources(self):
+        """
+        Explains why a state is unsafe, from the leftover processes and work
+        the failed safety check just left in _last_unsafe. Work only grows
+        through releases, so the state cannot become safe until released
+        resources cover the shortfall of at least one leftover process.
+        :return: A tuple (short, deficit): the resource types some leftover
+                 process is short on, and the smallest total shortfall of
+                 any leftover process.
+        """
+        leftover, work = self._last_unsafe
+        short = set()
+        deficit = None
+        for i in leftover:
+            need_i = self.need[i]
+            missing = [j for j in range(self.num_resources) if need_i[j] > work[j]]
+            short.update(missing)
+            total = sum(need_i[j] - work[j] for j in missing)
+            deficit = total if deficit is None else min(deficit, total)
+        return sorted(short), deficit or 0
+
+    def request_resources(self, process_id, request, wait=False, priority=0, on_grant=None):
         """
         Handles a resource request from a process.
         :param process_id: The ID of the requesting process.
         :param request: A list of requested instances for each resource.
+        :param wait: If True, a request denied for lack of resources or safety is
+                     queued and retried when other processes release resources.
+        :param priority: Queue priority (higher first) when queue_policy is "priority".
+        :param on_grant: Optional callback(process_id, request, message) invoked
+                         when a queued request is granted later.
         :return: A tuple (boolean, string) indicating success/failure and a message.
         """
+        if self.metrics is None:
+            return self._request_resources(process_id, request, wait, priority, on_grant)
+        start = time.perf_counter()
+        result = self._request_resources(process_id, request, wait, priority, on_grant)
+        self.metrics.request_seconds.record(time.perf_counter() - start)
+        return result
+
+    def _request_resources(self, process_id, request, wait, priority, on_grant):
+        if self.detection is not None:
+            return self._request_detection_mode(process_id, request, wait, priority, on_grant)
+
         # 1. Check if Request <= Need
         if not all(request[j] <= self.need[process_id][j] for j in range(self.num_resources)):
-            return False, f"Error: Process {process_id} has exceeded its maximum claim."
+            return self._outcome("exceeded_claim", (False, f"Error: Process {process_id} has exceeded its maximum claim."))
 
         # 2. Check if Request <= Available
-        if not all(request[j] <= self.available[j] for j in range(self.num_resources)):
-            return False, f"Request by P{process_id} denied. Resources not available. Process must wait."
+        blocked_on = [j for j in range(self.num_resources) if request[j] > self.available[j]]
+        if blocked_on:
+            if wait:
+                self._enqueue(PendingRequest(process_id, request, priority, on_grant), blocked_on)
+            return self._outcome("unavailable", (False, f"Request by P{process_id} denied. Resources not available. Process must wait."))
 
         # 3. Pretend to allocate the resources
-        for j in range(self.num_resources):
-            self.available[j] -= request[j]
-            self.allocation[process_id][j] += request[j]
-            self.need[process_id][j] -= request[j]
+        self._allocate(process_id, request)
 
         # 4. Check if the new state is safe
-        is_safe, sequence = self.is_safe_state()
+        is_safe, sequence = self._check_safety()
 
         if is_safe:
             # If safe, the request is granted
-            return True, f"Request by P{process_id} granted. Safe sequence: {self._format_sequence(sequence)}"
+            self._version += 1
+            self._invalidate_headroom(process_id, worsened=True)
+            return self._outcome("granted", (True, f"Request by P{process_id} granted. Safe sequence: {self._format_sequence(sequence)}"))
         else:
             # If not safe, roll back the changes
+            if wait:
+                blocked_on, deficit = self._blocking_resources()
+            self._deallocate(process_id, request)
+            if wait:
+                self._enqueue(PendingRequest(process_id, request, priority, on_grant), blocked_on, deficit)
+            return self._outcome("unsafe", (False, f"Request by P{process_id} denied. Granting request would lead to an unsafe state."))
+
+    def _request_detection_mode(self, process_id, request, wait, priority, on_grant):
+        """Detection-mode admission: grant whenever Available allows, in O(m)."""
+        if self.claims_declared and not all(request[j] <= self.need[process_id][j] for j in range(self.num_resources)):
+            result = self._outcome("exceeded_claim", (False, f"Error: Process {process_id} has exceeded its maximum claim."))
+        elif any(request[j] > self.available[j] for j in range(self.num_resources)):
+            # The process blocks on this request; the detector tests it against Work
+            row = _writable_row(self.requests, process_id)
+            for j in range(self.num_resources):
+                row[j] = request[j]
+            self._version += 1
+            if wait:
+                blocked_on = [j for j in range(self.num_resources) if request[j] > self.available[j]]
+                self._enqueue(PendingRequest(process_id, request, priority, on_grant), blocked_on)
+            result = self._outcome("unavailable", (False, f"Request by P{process_id} denied. Resources not available. Process must wait."))
+        else:
+            self._grant_detection_mode(process_id, request)
+            result = self._outcome("granted", (True, f"Request by P{process_id} granted."))
+        self._detection_event()
+        return result
+
+    def _grant_detection_mode(self, process_id, request):
+        if not self.claims_declared:
+            # Undeclared claims track the largest allocation seen so far
+            max_row = _writable_row(self.max_demand, process_id)
+            need_row = _writable_row(self.need, process_id)
+            alloc_i = self.allocation[process_id]
+            for j in range(self.num_resources):
+                excess = alloc_i[j] + request[j] - max_row[j]
+                if excess > 0:
+                    max_row[j] += excess
+                    need_row[j] += excess
+        self._allocate(process_id, request)
+        self._version += 1
+        if any(self.requests[process_id]):
+            row = _writable_row(self.requests, process_id)
+            for j in range(self.num_resources):
+                row[j] = 0
+        self._invalidate_headroom(process_id, worsened=True)
+
+    def _detection_event(self):
+        """Counts a request/release and runs the detector when one is due."""
+        schedule = self.detection
+        if schedule is None:
+            return
+        schedule.events += 1
+        if (schedule.every is not None and schedule.events >= schedule.every) or \
+                (schedule.interval is not None and time.monotonic() - schedule.last_run >= schedule.interval):
+            self.detect_deadlock()
+
+    def detect_deadlock(self):
+        """
+        Multi-instance deadlock detection (Coffman/Shoshani): like the safety
+        check, but tests each process's outstanding Request instead of its
+        Need. Processes that can never be satisfied and hold resources are
+        deadlocked; processes holding nothing never are.
+        :return: The sorted list of deadlocked process IDs (also kept in self.deadlocked).
+        """
+        if self.requests is None:
+            raise ValueError("Deadlock detection is not enabled.")
+        self.deadlocked = self._deadlocked_processes()
+        schedule = self.detection
+        if schedule is not None:
+            schedule.events = 0
+            schedule.last_run = time.monotonic()
+            schedule.runs += 1
+            if self.deadlocked and schedule.on_deadlock is not None:
+                schedule.on_deadlock(list(self.deadlocked))
+        return self.deadlocked
+
+    def _deadlocked_processes(self):
+        finished, _ = self._incremental_run(self.requests)
+        done = bytearray(self.num_processes)
+        for i in finished:
+            done[i] = 1
+        return [i for i in range(self.num_processes) if not done[i] and any(self.allocation[i])]
+
+    def _outcome(self, reason, result):
+        """Counts a request outcome when metrics are enabled and passes the result through."""
+        if self.metrics is not None:
+            self.metrics.outcomes[reason] += 1
+        return result
+
+    def request_resources_batch(self, requests, order="fifo"):
+        """
+        Admits a burst of requests against one state snapshot. The Need and
+        Available checks are screened for the whole batch at once, then a
+        maximal safe subset is admitted greedily in the chosen order. The
+        whole subset is first tried with a single safety check; only if that
+        fails are candidates admitted one by one, reusing the certificate.
+        :param requests: A list of (process_id, request) or (process_id, request, priority) tuples.
+        :param order: Admission order: "fifo", "smallest" (fewest total instances first) or "priority".
+        :return: A list of (boolean, string) tuples in input order, with the
+                 same messages as request_resources.
+        """
+        if order not in ("fifo", "smallest", "priority"):
+            raise ValueError("order must be 'fifo', 'smallest' or 'priority'.")
+
+        if self.detection is not None:
+            # No safety check to share: admit each request on its own, in order
+            results = [None] * len(requests)
+            for k in self._admission_order(requests, list(range(len(requests))), order):
+                results[k] = self._request_resources(requests[k][0], requests[k][1], False, 0, None)
+            return results
+
+        results = [None] * len(requests)
+        within_need, within_available = self._screen_batch(requests)
+        candidates = []
+        for k, item in enumerate(requests):
+            pid = item[0]
+            if not within_need[k]:
+                results[k] = self._outcome("exceeded_claim", (False, f"Error: Process {pid} has exceeded its maximum claim."))
+            elif not within_available[k]:
+                results[k] = self._outcome("unavailable", (False, f"Request by P{pid} denied. Resources not available. Process must wait."))
+            else:
+                candidates.append(k)
+
+        candidates = self._admission_order(requests, candidates, order)
+
+        # Optimistic pass: admit everything that still fits and check safety once.
+        # Verdicts for candidates that no longer fit are final only if the pass holds.
+        admitted = []
+        deferred = {}
+        for k in candidates:
+            pid, request = requests[k][0], requests[k][1]
+            verdict = self._fits(pid, request)
+            if verdict is None:
+                self._allocate(pid, request)
+                admitted.append(k)
+            else:
+                deferred[k] = verdict
+        is_safe, sequence = self._check_safety() if admitted else (True, [])
+        if is_safe:
+            self._version += 1
+            message_tail = f"Safe sequence: {self._format_sequence(sequence)}"
+            for k in admitted:
+                self._invalidate_headroom(requests[k][0], worsened=True)
+                results[k] = self._outcome("granted", (True, f"Request by P{requests[k][0]} granted. {message_tail}"))
+            for k, verdict in deferred.items():
+                results[k] = self._outcome(*verdict)
+            return results
+
+        # Fall back to admitting every candidate one at a time, as single calls would
+        for k in reversed(admitted):
+            self._deallocate(requests[k][0], requests[k][1])
+        for k in candidates:
+            pid, request = requests[k][0], requests[k][1]
+            verdict = self._fits(pid, request)
+            if verdict is not None:
+                results[k] = self._outcome(*verdict)
+                continue
+            self._allocate(pid, request)
+            is_safe, sequence = self._check_safety()
+            if is_safe:
+                self._version += 1
+                self._invalidate_headroom(pid, worsened=True)
+                results[k] = self._outcome("granted", (True, f"Request by P{pid} granted. Safe sequence: {self._format_sequence(sequence)}"))
+            else:
+                self._deallocate(pid, request)
+                results[k] = self._outcome("unsafe", (False, f"Request by P{pid} denied. Granting request would lead to an unsafe state."))
+        return results
+
+    @staticmethod
+    def _admission_order(requests, indices, order):
+        if order == "smallest":
+            indices.sort(key=lambda k: sum(requests[k][1]))
+        elif order == "priority":
+            indices.sort(key=lambda k: -(requests[k][2] if len(requests[k]) > 2 else 0))
+        return indices
+
+    def _screen_batch(self, requests):
+        """
+        Runs the Request <= Need and Request <= Available checks for every
+        request in a batch against the current state.
+        :return: Two lists of booleans (within_need, within_available).
+        """
+        m = self.num_resources
+        within_need = [all(request[j] <= self.need[pid][j] for j in range(m)) for pid, request, *_ in requests]
+        within_available = [all(request[j] <= self.available[j] for j in range(m)) for _, request, *_ in requests]
+        return within_need, within_available
+
+    def _fits(self, process_id, request):
+        """
+        Re-checks Need and Available for one request against the current state.
+        :return: None if the request fits, else a (reason, (False, message))
+                 pair for _outcome.
+        """
+        if not all(request[j] <= self.need[process_id][j] for j in range(self.num_resources)):
+            return "exceeded_claim", (False, f"Error: Process {process_id} has exceeded its maximum claim.")
+        if not all(request[j] <= self.available[j] for j in range(self.num_resources)):
+            return "unavailable", (False, f"Request by P{process_id} denied. Resources not available. Process must wait.")
+        return None
+
+    def release_resources(self, process_id, release):
+        """
+        Returns resources held by a process to the pool and retries the queued
+        requests that were waiting on the released resource types.
+        :param process_id: The ID of the releasing process.
+        :param release: A list of released instances for each resource.
+        :return: A tuple (boolean, string) indicating success/failure and a message.
+        """
+        if not all(0 <= release[j] <= self.allocation[process_id][j] for j in range(self.num_resources)):
+            return False, f"Error: Process {process_id} cannot release more than it holds."
+
+        # Releasing only makes the state safer, so the certificate stays valid
+        self._deallocate(process_id, release)
+        self._version += 1
+        self._invalidate_headroom(process_id, worsened=False)
+        woken = self._wake_waiters(release)
+        self._detection_event()
+        return True, f"P{process_id} released {[int(x) for x in release]}.{self._format_woken(woken)}"
+
+    def complete_process(self, process_id):
+        """
+        Marks a process as finished: all of its resources are released, its
+        maximum claim drops to zero and its queued requests are discarded.
+        :param process_id: The ID of the finished process.
+        :return: A tuple (boolean, string) indicating success and a message.
+        """
+        self._drop_waiters(process_id)
+        held = [int(x) for x in self.allocation[process_id]]
+        self._deallocate(process_id, held)
+        self._version += 1
+        max_row = _writable_row(self.max_demand, process_id)
+        need_row = _writable_row(self.need, process_id)
+        for j in range(self.num_resources):
+            max_row[j] = 0
+            need_row[j] = 0
+        if self.requests is not None and any(self.requests[process_id]):
+            request_row = _writable_row(self.requests, process_id)
             for j in range(self.num_resources):
-                self.available[j] += request[j]
-                self.allocation[process_id][j] -= request[j]
-                self.need[process_id][j] += request[j]
-            return False, f"Request by P{process_id} denied. Granting request would lead to an unsafe state."
+                request_row[j] = 0
+        self._invalidate_headroom(process_id, worsened=False)
+
+        woken = self._wake_waiters(held)
+        self._detection_event()
+        return True, f"P{process_id} completed and released {held}.{self._format_woken(woken)}"
+
+    def pending_requests(self):
+        """
+        :return: A list of (process_id, request) tuples still waiting, in the
+                 order they would be retried.
+        """
+        return [(w.process_id, list(w.request)) for w in sorted(self._waiters.values(), key=self._queue_key)]
+
+    def evaluate_candidates(self, candidates, workers=None):
+        """
+        Answers "would this request be granted?" for many candidate requests
+        against the current state, without changing it. Each candidate is
+        judged on its own, as if it were the only request made.
+        With workers > 1 the state is placed in shared memory once and the
+        candidates are split across a process pool; each worker maps the
+        shared buffer as a CompactBankersAlgorithm, so no matrices are pickled
+        per task. Detection-mode admission is an O(m) Available check, so a
+        banker in detection mode always evaluates in this process.
+        :param candidates: A list of (process_id, request) tuples.
+        :param workers: Number of worker processes; None or 1 evaluates in this process.
+        :return: A list of (boolean, string) tuples in input order, with the
+                 same messages as request_resources.
+        """
+        if not workers or workers <= 1 or len(candidates) < 2 or self.detection is not None:
+            snapshot = self.fork()
+            try:
+                return snapshot._evaluate_serial(candidates)
+            finally:
+                snapshot.discard()
+
+        shm = _share_state(self)
+        strategy = self.strategy if self.strategy in CompactBankersAlgorithm.SAFETY_STRATEGIES else None
+        # A few chunks per worker balances load; map() keeps the input order
+        size = -(-len(candidates) // (workers * 4))
+        chunks = [candidates[k:k + size] for k in range(0, len(candidates), size)]
+        try:
+            with Pool(workers, _init_candidate_worker,
+                      (shm.name, self.num_processes, self.num_resources, strategy, self._certificate)) as pool:
+                return [result for chunk in pool.map(_evaluate_chunk, chunks) for result in chunk]
+        finally:
+            shm.close()
+            shm.unlink()
+
+    def _evaluate_serial(self, candidates):
+        """Runs each candidate through request_resources and rolls back any grant."""
+        if self.detection is not None:
+            # Same admission rules, but no detector runs and no callback fires
+            self.detection = DetectionSchedule()
+        # Every candidate starts from the parent's certificate, so a message
+        # never depends on which candidates were evaluated before it
+        certificate = self._certificate
+        results = []
+        for process_id, request in candidates:
+            self._certificate = certificate
+            result = self.request_resources(process_id, request)
+            if result[0]:
+                self._deallocate(process_id, request)
+            results.append(result)
+        return results
+
+    def max_grantable(self, process_id):
+        """
+        For each resource type j, the largest amount of j alone that can be
+        granted to the process right now while staying safe. Safety is
+        monotone in the grant, so each entry is a binary search. A safe
+        sequence of the current state is found first and serves as the
+        certificate for every probe, so a probe that stays safe costs one
+        O(n * m) check. Results are cached until a mutation invalidates them.
+        :param process_id: The ID of the process.
+        :return: A list with one maximum grant per resource type.
+        """
+        row = self._headroom.get(process_id)
+        if row is None:
+            row = [None] * self.num_resources
+            self._headroom[process_id] = row
+        if None in row and not self._probe_safety():
+            # No grant can make an unsafe state safe
+            return [0 if x is None else x for x in row]
+        for j in range(self.num_resources):
+            if row[j] is None:
+                row[j] = self._max_safe_grant(process_id, j)
+        return list(row)
+
+    def cached_max_grantable(self, process_id):
+        """
+        max_grantable without computing anything, for displays that fill in
+        headroom lazily.
+        :return: The cached entries, with None where a mutation invalidated
+                 an entry or it was never computed.
+        """
+        row = self._headroom.get(process_id)
+        return list(row) if row is not None else [None] * self.num_resources
+
+    def headroom_matrix(self):
+        """
+        :return: A 2D list with max_grantable(i) for every process.
+        """
+        return [self.max_grantable(i) for i in range(self.num_processes)]
+
+    def _max_safe_grant(self, process_id, j):
+        upper = min(int(self.need[process_id][j]), int(self.available[j]))
+        if upper <= 0:
+            return 0
+
+        grant = [0] * self.num_resources
+
+        def safe_with(amount):
+            grant[j] = amount
+            self._allocate(process_id, grant)
+            is_safe = self._probe_safety()
+            self._deallocate(process_id, grant)
+            return is_safe
+
+        if safe_with(upper):
+            return upper
+        low, high = 0, upper - 1  # low is always safe (no grant at all)
+        while low < high:
+            mid = (low + high + 1) // 2
+            if safe_with(mid):
+                low = mid
+            else:
+                high = mid - 1
+        return low
+
+    def _invalidate_headroom(self, process_id, worsened):
+        """
+        Drops the cached headroom entries a state change can affect. The
+        changed process loses its whole row. After a grant (worsened=True)
+        every other entry can only shrink, so entries already at 0 stay
+        valid. After a release the entries can only grow, so entries already
+        at the process's full need stay valid.
+        """
+        if not self._headroom:
+            return
+        self._headroom.pop(process_id, None)
+        for pid, row in self._headroom.items():
+            if worsened:
+                for j in range(self.num_resources):
+                    if row[j] != 0:
+                        row[j] = None
+            else:
+                need_row = self.need[pid]
+                for j in range(self.num_resources):
+                    if row[j] != need_row[j]:
+                        row[j] = None
+
+    def fork(self):
+        """
+        Returns a copy-on-write what-if snapshot of this banker. The snapshot
+        shares every row with its parent and copies a row only when it
+        changes it, so forking costs O(rows already copied), not O(n * m).
+        It supports the full request/release API (with its own, initially
+        empty, wait queue) and can be committed back or discarded. Metrics
+        start off on the fork, so its traffic never lands in the parent's,
+        and detection on the fork runs without the on_deadlock callback.
+        Rows must only be changed through the banker's methods.
+        :return: A new banker of the same class.
+        """
+        # A fork of a fork that outlived its own parent cannot fold us back
+        self._fold_overlays()
+        child = copy.copy(self)
+        child._headroom = {}
+        child.metrics = None
+        child.detection = copy.copy(self.detection)
+        if child.detection is not None:
+            child.detection.on_deadlock = None  # the fork's deadlocks are not the parent's
+        for name in self._matrix_names():
+            matrix = getattr(self, name)
+            # Both sides get a fresh overlay, so neither sees the other's writes;
+            # the parent's is folded back once its last fork is closed
+            overlay = CowMatrix(matrix)
+            setattr(self, name, overlay)
+            setattr(child, name, CowMatrix(overlay))
+            if isinstance(matrix, CowMatrix):
+                matrix.release()
+        child.available = copy.copy(self.available)
+        child._reset_queue()
+        child._parent = self
+        child._parent_version = self._version
+        return child
+
+    def commit(self):
+        """
+        Makes this fork's state the parent's live state. Fails if the parent
+        changed after the fork was taken. Waiters queued on the fork are not
+        carried over.
+        :return: The parent banker.
+        """
+        parent = self._parent
+        if parent is None:
+            raise ValueError("Only an open fork can be committed.")
+        if parent._version != self._parent_version:
+            raise RuntimeError("The parent state changed after the fork was taken; cannot commit.")
+
+        for name in ("available",) + self._matrix_names():
+            replaced = getattr(parent, name)
+            if isinstance(replaced, CowMatrix):
+                replaced.release()
+            setattr(parent, name, getattr(self, name))
+            setattr(self, name, None)  # now the parent's; discard() must not release it
+        parent._certificate = self._certificate
+        parent._headroom = self._headroom
+        parent._version += 1
+        self.discard()
+        return parent
+
+    def discard(self):
+        """Drops this fork; the parent is left untouched."""
+        parent = self._parent
+        if parent is None:
+            raise ValueError("Only an open fork can be discarded.")
+        for name in self._matrix_names():
+            matrix = getattr(self, name)
+            if isinstance(matrix, CowMatrix):
+                matrix.release()
+        self._parent = None
+        self.available = self.max_demand = self.allocation = self.need = self.requests = None
+        parent._fold_overlays()
+
+    def _fold_overlays(self):
+        """
+        Replaces the copy-on-write overlays fork() put on this banker's
+        matrices by the plain matrices once no open fork shares them, so
+        later forks start from an empty overlay again. Runs when a fork of
+        this banker is closed and before the next fork is taken.
+        """
+        for name in self._matrix_names():
+            matrix = getattr(self, name)
+            if isinstance(matrix, CowMatrix) and matrix.folds:
+                setattr(self, name, matrix.fold())
+
+    def _allocate(self, process_id, request):
+        alloc_row = _writable_row(self.allocation, process_id)
+        need_row = _writable_row(self.need, process_id)
+        for j in range(self.num_resources):
+            self.available[j] -= request[j]
+            alloc_row[j] += request[j]
+            need_row[j] -= request[j]
+
+    def _deallocate(self, process_id, release):
+        alloc_row = _writable_row(self.allocation, process_id)
+        need_row = _writable_row(self.need, process_id)
+        for j in range(self.num_resources):
+            self.available[j] += release[j]
+            alloc_row[j] -= release[j]
+            need_row[j] += release[j]
+
+    def _queue_key(self, waiter):
+        if self.queue_policy == "priority":
+            return (-waiter.priority, waiter.seq)
+        return waiter.seq
+
+    def _enqueue(self, waiter, blocked_on, deficit=0):
+        """
+        Adds a waiter to the queue and indexes it under the resource types it
+        is blocked on: those it asked for beyond available, or for a request
+        refused as unsafe, those the stuck processes were short on. An unsafe
+        waiter is not retried before `deficit` more units have been released.
+        """
+        waiter.retry_at = self._units_released + deficit
+        if waiter.seq is None:
+            waiter.seq = self._next_waiter_seq
+            self._next_waiter_seq += 1
+            self._waiters[waiter.seq] = waiter
+        waiter.blocked_on = blocked_on
+        for j in blocked_on:
+            self._waiting_on[j].add(waiter.seq)
+
+    def _unindex(self, waiter):
+        for j in waiter.blocked_on:
+            self._waiting_on[j].discard(waiter.seq)
+
+    def _drop_waiters(self, process_id):
+        for waiter in [w for w in self._waiters.values() if w.process_id == process_id]:
+            self._unindex(waiter)
+            del self._waiters[waiter.seq]
+
+    def _wake_waiters(self, released):
+        """
+        Retries only the waiters indexed under a resource type that was just
+        released, in queue order, skipping unsafe waiters whose shortfall the
+        releases so far cannot cover. Waiters that still cannot be granted are
+        re-indexed and keep their queue position.
+        :return: A list of process IDs whose queued requests were granted.
+        """
+        self._units_released += int(sum(released))
+        candidates = set()
+        for j in range(self.num_resources):
+            if released[j] > 0:
+                candidates.update(self._waiting_on[j])
+        if not candidates:
+            return []
+
+        woken = []
+        # pid -> [(request, blocked_on, deficit)] for requests found unsafe since
+        # the last grant of this pass. Granting more can only make a state less
+        # safe, so a later waiter of the same process asking for at least as
+        # much is unsafe too and is re-queued without a safety check.
+        refused = {}
+        for waiter in sorted((self._waiters[seq] for seq in candidates), key=self._queue_key):
+            if waiter.retry_at > self._units_released:
+                continue
+            self._unindex(waiter)
+            pid, request = waiter.process_id, waiter.request
+
+            if self.claims_declared and not all(request[j] <= self.need[pid][j] for j in range(self.num_resources)):
+                del self._waiters[waiter.seq]  # the claim shrank below the request
+                continue
+
+            blocked_on = [j for j in range(self.num_resources) if request[j] > self.available[j]]
+            if blocked_on:
+                self._enqueue(waiter, blocked_on)
+                continue
+
+            if self.detection is not None:
+                self._grant_detection_mode(pid, request)
+                del self._waiters[waiter.seq]
+                self._outcome("queued_grant", None)
+                woken.append(pid)
+                if waiter.on_grant is not None:
+                    waiter.on_grant(pid, request, f"Request by P{pid} granted.")
+                continue
+
+            known = next((reason for smaller, reason in refused.get(pid, ())
+                          if all(request[j] >= smaller[j] for j in range(self.num_resources))), None)
+            if known is not None:
+                self._enqueue(waiter, *known)
+                continue
+            self._allocate(pid, request)
+            is_safe, sequence = self._check_safety()
+            if not is_safe:
+                reason = self._blocking_resources()
+                refused.setdefault(pid, []).append((request, reason))
+                self._deallocate(pid, request)
+                self._enqueue(waiter, *reason)
+                continue
+
+            refused.clear()
+            del self._waiters[waiter.seq]
+            self._version += 1
+            self._invalidate_headroom(pid, worsened=True)
+            self._outcome("queued_grant", None)
+            woken.append(pid)
+            if waiter.on_grant is not None:
+                waiter.on_grant(pid, request, f"Request by P{pid} granted. Safe sequence: {self._format_sequence(sequence)}")
+        return woken
+
+    def _format_woken(self, woken):
+        if not woken:
+            return ""
+        return " Granted queued request(s) of " + ", ".join(f"P{i}" for i in woken) + "."
+
+    def _check_safety(self):
+        """
+        Safety check used by request_resources. The last safe sequence is
+        re-validated first in one O(n * m) pass; the full search only runs
+        when that certificate no longer holds.
+        :return: A tuple (boolean, list) like is_safe_state.
+        """
+        if self._certificate is not None and self._verify_sequence(self._certificate):
+            self.certificate_hits += 1
+            return True, self._certificate
+
+        self.certificate_misses += 1
+        is_safe, sequence = self.is_safe_state()
+        if is_safe:
+            self._certificate = sequence
+        return is_safe, sequence
+
+    def _probe_safety(self):
+        """
+        Safety check for read-only queries such as max_grantable: like
+        _check_safety, but leaves the certificate, its hit/miss counters and
+        the metrics untouched, so queries do not show up as request traffic.
+        A sequence found here becomes the probe certificate; one that is safe
+        with a tentative grant is also safe without it.
+        :return: True if the current (tentative) state is safe.
+        """
+        for certificate in (self._probe_certificate, self._certificate):
+            if certificate is not None and self._verify_sequence(certificate):
+                return True
+        is_safe, sequence = getattr(self, self.SAFETY_STRATEGIES[self.strategy])()
+        if is_safe:
+            self._probe_certificate = sequence
+        return is_safe
+
+    def _verify_sequence(self, sequence):
+        """
+        Checks whether running the processes in the given order is a safe
+        sequence for the current state.
+        """
+        work = list(self.available)
+        for i in sequence:
+            need_i = self.need[i]
+            if any(need_i[j] > work[j] for j in range(self.num_resources)):
+                return False
+            alloc_i = self.allocation[i]
+            for j in range(self.num_resources):
+                work[j] += alloc_i[j]
+        return True
 
     def _format_sequence(self, sequence):
-        return " -> ".join([f"P{i}" for i in sequence])
\ No newline at end of file
+        return " -> ".join([f"P{i}" for i in sequence])
+
+
+class CompactBankersAlgorithm(BankersAlgorithm):
+    """
+    Memory-compact variant of BankersAlgorithm. max_demand, allocation and
+    need are FlatMatrix buffers (8 bytes per cell, no per-int objects) and
+    available is an array('q'); banker.need[i][j] style access keeps working.
+    """
+    def _init_matrices(self, available, max_demand, allocation):
+        self.available = array('q', available)
+        self.num_resources = len(self.available)
+
+        # FlatMatrix inputs (e.g. over shared memory) are wrapped, not copied
+        self.max_demand = max_demand if isinstance(max_demand, FlatMatrix) else FlatMatrix.from_rows(max_demand, self.num_resources)
+        self.allocation = allocation if isinstance(allocation, FlatMatrix) else FlatMatrix.from_rows(allocation, self.num_resources)
+        if len(self.allocation) != len(self.max_demand):
+            raise ValueError("max_demand and allocation must have the same number of rows.")
+        self.num_processes = len(self.max_demand)
+
+        if isinstance(max_demand, FlatMatrix):
+            # Wrapped buffers can be huge; derive need rows as they are used
+            self.need = LazyNeedMatrix(self.max_demand, self.allocation)
+            return
+
+        need = array('q', self.max_demand._view)
+        alloc = self.allocation._view
+        for k in range(len(need)):
+            need[k] -= alloc[k]
+        self.need = FlatMatrix(self.num_processes, self.num_resources, need)
+
+    def _new_matrix(self):
+        return FlatMatrix(self.num_processes, self.num_resources)
+
+    @classmethod
+    def _from_blocks(cls, values, num_processes, num_resources, strategy):
+        """Wraps the blocks in place: no copy, and need is derived lazily."""
+        m, cells = num_resources, num_processes * num_resources
+        return cls(values[:m],
+                   FlatMatrix(num_processes, m, values[m:m + cells]),
+                   FlatMatrix(num_processes, m, values[m + cells:m + 2 * cells]),
+                   strategy=strategy)
+
+
+class NumpyBankersAlgorithm(BankersAlgorithm):
+    """
+    Array-backed variant of BankersAlgorithm for large states.
+    available, allocation and need are stored as NumPy int64 arrays so the
+    safety check can test every unfinished process in one vectorized pass.
+    """
+    SAFETY_STRATEGIES = dict(BankersAlgorithm.SAFETY_STRATEGIES, vectorized="_vectorized_safe_state")
+    DEFAULT_STRATEGY = "vectorized"
+
+    def __init__(self, available, max_demand, allocation, strategy=None, queue_policy="fifo"):
+        """
+        Accepts the same list-of-lists arguments as BankersAlgorithm
+        (or anything np.array can convert).
+        """
+        if np is None:
+            raise ImportError("NumpyBankersAlgorithm requires NumPy (pip install numpy).")
+        super().__init__(available, max_demand, allocation, strategy, queue_policy)
+
+    def _init_matrices(self, available, max_demand, allocation):
+        self.available = np.array(available, dtype=np.int64)
+        self.max_demand = np.array(max_demand, dtype=np.int64).reshape(-1, len(self.available))
+        self.allocation = np.array(allocation, dtype=np.int64).reshape(self.max_demand.shape)
+
+        self.num_processes, self.num_resources = self.max_demand.shape
+        self.need = self.max_demand - self.allocation
+
+    @classmethod
+    def _from_blocks(cls, values, num_processes, num_resources, strategy):
+        flat = np.frombuffer(values, dtype=np.int64)
+        m, cells = num_resources, num_processes * num_resources
+        return cls(flat[:m], flat[m:m + cells].reshape(-1, m), flat[m + cells:].reshape(-1, m), strategy=strategy)
+
+    def fork(self):
+        """
+        Vectorized checks need whole arrays, so a NumPy fork copies the
+        matrices (one memcpy each) instead of layering copy-on-write rows.
+        """
+        child = copy.copy(self)
+        child._headroom = {}
+        child.metrics = None
+        child.detection = copy.copy(self.detection)
+        if child.detection is not None:
+            child.detection.on_deadlock = None  # the fork's deadlocks are not the parent's
+        for name in ("available",) + self._matrix_names():
+            setattr(child, name, getattr(self, name).copy())
+        child._reset_queue()
+        child._parent = self
+        child._parent_version = self._version
+        return child
+
+    def _new_matrix(self):
+        return np.zeros((self.num_processes, self.num_resources), dtype=np.int64)
+
+    def _deadlocked_processes(self):
+        _, pending, _ = self._vectorized_run(self.requests)
+        return pending[self.allocation[pending].any(axis=1)].tolist()
+
+    def _finish_order(self, strategy):
+        if strategy == "vectorized":
+            return self._vectorized_run(self.need)[0]
+        return super()._finish_order(strategy)
+
+    def _vectorized_safe_state(self):
+        """
+        Vectorized safety check. Each pass releases every process whose
+        Need <= Work at once, so a check costs O(passes * n * m) array work
+        instead of O(n^2 * m) interpreter steps.
+        """
+        safe_sequence, pending, work = self._vectorized_run(self.need)
+        if pending.size:
+            self._last_unsafe = (pending, work)
+            return False, []
+        return True, safe_sequence
+
+    def _vectorized_run(self, demand):
+        """
+        :return: A tuple (sequence, pending, work): the processes that could
+                 finish, the array of those that could not, and the final work.
+        """
+        work = self.available.copy()
+        pending = np.arange(self.num_processes)
+        safe_sequence = []
+        passes = scanned = 0
+
+        while pending.size:
+            passes += 1
+            scanned += pending.size
+            runnable = (demand[pending] <= work).all(axis=1)
+            if not runnable.any():
+                break
+
+            ready = pending[runnable]
+            work += self.allocation[ready].sum(axis=0)
+            safe_sequence.extend(ready.tolist())
+            pending = pending[~runnable]
+
+        self._last_check = (passes, scanned)
+        return safe_sequence, pending, work
+
+    def _blocking_resources(self):
+        pending, work = self._last_unsafe
+        pending = np.asarray(pending)
+        shortfall = np.maximum(self.need[pending] - work, 0)
+        return np.flatnonzero(shortfall.any(axis=0)).tolist(), int(shortfall.sum(axis=1).min())
+
+    def _screen_batch(self, requests):
+        if not requests:
+            return [], []
+        pids = np.array([item[0] for item in requests])
+        vectors = np.array([item[1] for item in requests], dtype=np.int64).reshape(len(requests), self.num_resources)
+        within_need = (vectors <= self.need[pids]).all(axis=1)
+        within_available = (vectors <= self.available).all(axis=1)
+        return within_need.tolist(), within_available.tolist()
+
+    def _verify_sequence(self, sequence):
+        """
+        Vectorized certificate check: process k in the sequence must fit in
+        available plus the allocations released by the processes before it.
+        """
+        order = np.asarray(sequence)
+        released = np.cumsum(self.allocation[order], axis=0) - self.allocation[order]
+        return bool((self.need[order] <= self.available + released).all())
+
+
+# --- Worker side of BankersAlgorithm.evaluate_candidates ---
+
+_worker_shm = None
+_worker_banker = None
+
+
+def _share_state(banker):
+    """
+    Copies available, max_demand and allocation into one new shared-memory
+    block of int64 values, laid out as [available | max_demand | allocation].
+    """
+    n, m = banker.num_processes, banker.num_resources
+    shm = shared_memory.SharedMemory(create=True, size=8 * max(1, m + 2 * n * m))
+    view = shm.buf.cast('q')
+    try:
+        view[:m] = array('q', [int(x) for x in banker.available])
+        offset = m
+        for matrix in (banker.max_demand, banker.allocation):
+            for row in matrix:
+                view[offset:offset + m] = array('q', [int(x) for x in row])
+                offset += m
+    finally:
+        view.release()
+    return shm
+
+
+def _init_candidate_worker(name, num_processes, num_resources, strategy, certificate):
+    """Pool initializer: maps the shared state once per worker process."""
+    global _worker_shm, _worker_banker
+    _worker_shm = shared_memory.SharedMemory(name=name)
+    view = _worker_shm.buf.cast('q')
+    m, cells = num_resources, num_processes * num_resources
+    _worker_banker = CompactBankersAlgorithm(
+        view[:m],
+        FlatMatrix(num_processes, m, view[m:m + cells]),
+        FlatMatrix(num_processes, m, view[m + cells:m + 2 * cells]),
+        strategy=strategy)
+    _worker_banker._certificate = certificate
+
+
+def _evaluate_chunk(candidates):
+    snapshot = _worker_banker.fork()
+    try:
+        return snapshot._evaluate_serial(candidates)
+    finally:
+        snapshot.discard()
@@ -0,0 +1,162 @@
+# bankers_metrics.py
+"""
+Low-overhead instrumentation for BankersAlgorithm.
+
+A banker only records metrics after banker.enable_metrics(); until then the
+hot paths skip all bookkeeping. Metrics can be exported as Prometheus text
+or as a JSON-serializable snapshot.
+"""
+import math
+
+OUTCOMES = ("granted", "queued_grant", "exceeded_claim", "unavailable", "unsafe")
+
+# Bucket bounds (seconds) exposed in the Prometheus histogram
+PROMETHEUS_BOUNDS = (1e-6, 2.5e-6, 5e-6, 1e-5, 2.5e-5, 5e-5, 1e-4, 2.5e-4, 5e-4,
+                     1e-3, 2.5e-3, 5e-3, 1e-2, 2.5e-2, 5e-2, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class LatencyHistogram:
+    """
+    Fixed-size log-scale histogram (about 9% bucket width), so millions of
+    samples cost constant memory. Percentiles are reported as the upper
+    edge of the bucket they fall in.
+    """
+    BASE = 1.09
+
+    def __init__(self, num_buckets=300, min_value=1e-7):
+        self.min_value = min_value
+        self.counts = [0] * num_buckets
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, value):
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+        if value <= self.min_value:
+            bucket = 0
+        else:
+            bucket = min(len(self.counts) - 1, int(math.log(value / self.min_value, self.BASE)) + 1)
+        self.counts[bucket] += 1
+
+    def upper_bound(self, bucket):
+        return self.min_value * self.BASE ** bucket
+
+    def percentile(self, p):
+        if not self.count:
+            return 0.0
+        rank = math.ceil(self.count * p / 100)
+        seen = 0
+        for bucket, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank:
+                return min(self.max, self.upper_bound(bucket))
+        return self.max
+
+    def cumulative(self, bounds):
+        """Counts of samples <= each bound (to bucket precision)."""
+        result = []
+        seen = 0
+        bucket = 0
+        for bound in bounds:
+            while bucket < len(self.counts) and self.upper_bound(bucket) <= bound:
+                seen += self.counts[bucket]
+                bucket += 1
+            result.append(seen)
+        return result
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "sum": self.total,
+            "max": self.max,
+            "p50": self.percentile(50),
+            "p90": self.percentile(90),
+            "p99": self.percentile(99),
+        }
+
+
+class BankerMetrics:
+    """Counters and histograms filled in by an instrumented BankersAlgorithm."""
+
+    def __init__(self):
+        self.request_seconds = LatencyHistogram()
+        self.safety_seconds = LatencyHistogram()
+        self.scanned_per_check = LatencyHistogram(min_value=1)
+        self.outcomes = dict.fromkeys(OUTCOMES, 0)
+        self.safety_checks = 0
+        self.safety_passes = 0
+        self.processes_scanned = 0
+
+    def record_safety(self, seconds, passes, scanned):
+        self.safety_checks += 1
+        self.safety_passes += passes
+        self.processes_scanned += scanned
+        self.safety_seconds.record(seconds)
+        self.scanned_per_check.record(scanned)
+
+    def snapshot(self, banker=None):
+        """
+        :param banker: Optional banker whose certificate counters and queue
+                       length are included.
+        :return: A JSON-serializable dict.
+        """
+        data = {
+            "requests": dict(self.outcomes),
+            "request_seconds": self.request_seconds.to_dict(),
+            "safety_checks": self.safety_checks,
+            "safety_passes": self.safety_passes,
+            "processes_scanned": self.processes_scanned,
+            "safety_seconds": self.safety_seconds.to_dict(),
+            "scanned_per_check": self.scanned_per_check.to_dict(),
+        }
+        if banker is not None:
+            data["certificate_hits"] = banker.certificate_hits
+            data["certificate_misses"] = banker.certificate_misses
+            data["pending_requests"] = len(banker._waiters)
+        return data
+
+    def to_prometheus(self, banker=None, prefix="bankers"):
+        """
+        :return: The metrics in the Prometheus text exposition format.
+        """
+        lines = [f"# HELP {prefix}_requests_total Resource requests by outcome.",
+                 f"# TYPE {prefix}_requests_total counter"]
+        for outcome, count in self.outcomes.items():
+            lines.append(f'{prefix}_requests_total{{outcome="{outcome}"}} {count}')
+
+        counters = [("safety_checks_total", "Full safety searches run.", self.safety_checks),
+                    ("safety_passes_total", "Passes or rescans made by safety searches.", self.safety_passes),
+                    ("processes_scanned_total", "Processes examined by safety searches.", self.processes_scanned)]
+        if banker is not None:
+            counters += [("certificate_hits_total", "Requests settled by the cached safe sequence.", banker.certificate_hits),
+                         ("certificate_misses_total", "Requests that needed a full safety search.", banker.certificate_misses)]
+        for name, help_text, value in counters:
+            lines += [f"# HELP {prefix}_{name} {help_text}", f"# TYPE {prefix}_{name} counter", f"{prefix}_{name} {value}"]
+
+        for name, help_text, hist in (("request_seconds", "request_resources latency.", self.request_seconds),
+                                      ("safety_check_seconds", "Full safety search latency.", self.safety_seconds)):
+            lines += [f"# HELP {prefix}_{name} {help_text}", f"# TYPE {prefix}_{name} histogram"]
+            for bound, count in zip(PROMETHEUS_BOUNDS, hist.cumulative(PROMETHEUS_BOUNDS)):
+                lines.append(f'{prefix}_{name}_bucket{{le="{bound:g}"}} {count}')
+            lines += [f'{prefix}_{name}_bucket{{le="+Inf"}} {hist.count}',
+                      f"{prefix}_{name}_sum {hist.total}",
+                      f"{prefix}_{name}_count {hist.count}"]
+        return "\n".join(lines) + "\n"
+
+    def summary_lines(self, banker=None):
+        """Short human-readable summary, used by the dashboard panel."""
+        us = 1e6
+        req, safety = self.request_seconds, self.safety_seconds
+        lines = [
+            "Requests: " + ", ".join(f"{k} {v}" for k, v in self.outcomes.items()),
+            f"Request latency: p50 {req.percentile(50) * us:.0f}us  p99 {req.percentile(99) * us:.0f}us",
+            f"Safety checks: {self.safety_checks}  passes {self.safety_passes}  scanned {self.processes_scanned}",
+            f"Safety latency: p50 {safety.percentile(50) * us:.0f}us  p99 {safety.percentile(99) * us:.0f}us",
+        ]
+        if banker is not None:
+            lines.append(f"Certificate: {banker.certificate_hits} hits / {banker.certificate_misses} misses"
+                         f"  Waiting: {len(banker._waiters)}")
+        return lines
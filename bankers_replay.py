@@ -0,0 +1,328 @@
+# bankers_replay.py
+"""
+Headless trace replay for the Banker's Algorithm.
+
+Streams request/release/complete events from a JSONL or CSV file through
+BankersAlgorithm without loading the file into memory, writes periodic
+checkpoints so a long replay can be resumed, and reports throughput,
+grant/deny ratios, request and safety-check latency percentiles at the end.
+
+JSONL events, one object per line:
+    {"op": "init", "available": [...], "max_demand": [[...]], "allocation": [[...]]}
+    {"op": "request", "pid": 3, "vector": [1, 0, 2]}
+    {"op": "release", "pid": 3, "vector": [1, 0, 0]}
+    {"op": "complete", "pid": 3}
+CSV events, one per row (the initial state comes from --state):
+    request,3,1,0,2
+
+Usage:
+    python bankers_replay.py run trace.jsonl [--state state.json] [--engine incremental]
+                                 [--checkpoint replay.ckpt] [--checkpoint-every 100000] [--resume]
+    python bankers_replay.py generate trace.jsonl --events 1000000 [--processes 1000] [--resources 8]
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+from bankers_logic import BankersAlgorithm, CompactBankersAlgorithm, NumpyBankersAlgorithm, PendingRequest
+from bankers_metrics import LatencyHistogram
+
+ENGINES = {
+    "scan": (BankersAlgorithm, "scan"),
+    "incremental": (BankersAlgorithm, "incremental"),
+    "compact": (CompactBankersAlgorithm, "incremental"),
+    "numpy": (NumpyBankersAlgorithm, None),
+}
+
+
+class ReplayStats:
+    """Counters accumulated over a replay; saved inside checkpoints."""
+    FIELDS = ("events", "requests", "granted", "exceeded", "unavailable", "unsafe",
+              "releases", "completions", "rejected_releases", "queued_grants")
+
+    def __init__(self, **counts):
+        for name in self.FIELDS:
+            setattr(self, name, counts.get(name, 0))
+        self.latency = LatencyHistogram()
+        self.elapsed = 0.0
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.FIELDS}
+
+    def count_request(self, success, message):
+        self.requests += 1
+        if success:
+            self.granted += 1
+        elif message.startswith("Error:"):
+            self.exceeded += 1
+        elif "not available" in message:
+            self.unavailable += 1
+        else:
+            self.unsafe += 1
+
+    def report(self, banker=None, out=sys.stdout):
+        rate = self.events / self.elapsed if self.elapsed else 0.0
+        denied = self.requests - self.granted
+        print(f"events:        {self.events} in {self.elapsed:.2f}s ({rate:,.0f} events/s)", file=out)
+        if self.requests:
+            print(f"requests:      {self.requests}  granted {self.granted} ({self.granted / self.requests:.1%}),"
+                  f" denied {denied} ({denied / self.requests:.1%})", file=out)
+            print(f"  denied by:   exceeded claim {self.exceeded}, unavailable {self.unavailable},"
+                  f" unsafe {self.unsafe}", file=out)
+        print(f"releases:      {self.releases} (+{self.completions} completions,"
+              f" {self.rejected_releases} rejected, {self.queued_grants} queued grants)", file=out)
+        if self.latency.count:
+            us = 1e6
+            print(f"request latency (this run): p50 {self.latency.percentile(50) * us:.1f}us"
+                  f"  p90 {self.latency.percentile(90) * us:.1f}us"
+                  f"  p99 {self.latency.percentile(99) * us:.1f}us"
+                  f"  max {self.latency.max * us:.1f}us", file=out)
+        metrics = banker.metrics if banker is not None else None
+        if metrics is not None and metrics.safety_checks:
+            safety = metrics.safety_seconds
+            print(f"safety checks (this run): {metrics.safety_checks}"
+                  f"  p50 {safety.percentile(50) * 1e6:.1f}us  p99 {safety.percentile(99) * 1e6:.1f}us"
+                  f"  avg scanned {metrics.processes_scanned / metrics.safety_checks:.1f}"
+                  f"  certificate hits {banker.certificate_hits}/{banker.certificate_hits + banker.certificate_misses}",
+                  file=out)
+
+
+def iter_events(path, fmt=None, offset=0):
+    """
+    Lazily yields (event, end_offset) pairs from a trace file, starting at
+    a byte offset. end_offset is where the next event begins, which is what
+    a checkpoint stores.
+    """
+    fmt = fmt or ("csv" if path.endswith(".csv") else "jsonl")
+    with open(path, "rb") as f:
+        f.seek(offset)
+        for line in f:
+            offset += len(line)
+            line = line.strip()
+            if not line or line.startswith(b"#"):
+                continue
+            if fmt == "jsonl":
+                yield json.loads(line), offset
+            else:
+                fields = line.decode().split(",")
+                if fields[0] == "op":
+                    continue  # header row
+                event = {"op": fields[0], "pid": int(fields[1])}
+                if len(fields) > 2:
+                    event["vector"] = [int(x) for x in fields[2:]]
+                yield event, offset
+
+
+def make_banker(engine, state):
+    cls, strategy = ENGINES[engine]
+    banker = cls(state["available"], state["max_demand"], state["allocation"], strategy=strategy)
+    banker.enable_metrics()
+    return banker
+
+
+def state_to_dict(banker):
+    return {
+        "available": [int(x) for x in banker.available],
+        "max_demand": [[int(x) for x in row] for row in banker.max_demand],
+        "allocation": [[int(x) for x in row] for row in banker.allocation],
+        "pending": banker.pending_requests(),
+    }
+
+
+def saved_waiters(banker):
+    """
+    The wait queue in queue order, with what is needed to restore it exactly:
+    priority, the resource types each waiter is indexed under and the units
+    that must still be released before an unsafe waiter is retried.
+    """
+    return [{"pid": w.process_id, "request": [int(x) for x in w.request], "priority": w.priority,
+             "blocked_on": list(w.blocked_on), "deficit": max(0, w.retry_at - banker._units_released)}
+            for w in sorted(banker._waiters.values(), key=lambda w: w.seq)]
+
+
+def restore_waiters(banker, waiters, on_grant=None):
+    """Re-queues saved waiters as they were, without running admission again."""
+    for w in waiters:
+        banker._enqueue(PendingRequest(w["pid"], w["request"], w["priority"], on_grant), w["blocked_on"], w["deficit"])
+
+
+def write_checkpoint(path, banker, stats, offset):
+    """Writes the checkpoint to a temporary file and renames it into place."""
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump({"offset": offset, "stats": stats.to_dict(), "state": state_to_dict(banker),
+                   "waiters": saved_waiters(banker)}, f)
+    os.replace(tmp, path)
+
+
+def replay(trace, state=None, engine="incremental", fmt=None, checkpoint=None,
+           checkpoint_every=100000, resume=False, wait=False, limit=None):
+    """
+    Replays a trace through a banker.
+    :param trace: Path of the JSONL or CSV trace.
+    :param state: Initial state dict (available, max_demand, allocation), or
+                  None if the trace starts with an "init" event.
+    :param engine: One of ENGINES.
+    :param checkpoint: Path of the checkpoint file, or None to disable.
+    :param checkpoint_every: Events between checkpoints.
+    :param resume: Continue from the checkpoint instead of the start of the trace.
+    :param wait: Queue requests that must wait, so later releases can grant them.
+    :param limit: Stop after this many events (counted from the start of the trace).
+    :return: A tuple (banker, ReplayStats).
+    """
+    offset = 0  # byte offset just past the last applied event
+    stats = ReplayStats()
+    banker = None
+
+    def on_grant(pid, request, message):
+        stats.queued_grants += 1
+
+    if resume and checkpoint and os.path.exists(checkpoint):
+        with open(checkpoint) as f:
+            saved = json.load(f)
+        offset = saved["offset"]
+        stats = ReplayStats(**saved["stats"])
+        banker = make_banker(engine, saved["state"])
+        restore_waiters(banker, saved["waiters"], on_grant)
+    elif state is not None:
+        banker = make_banker(engine, state)
+
+    start = time.perf_counter()
+    for event, next_offset in iter_events(trace, fmt, offset):
+        if limit is not None and stats.events >= limit:
+            break
+        op = event["op"]
+
+        if op == "init":
+            banker = make_banker(engine, event)
+        elif banker is None:
+            raise ValueError("No initial state: pass --state or start the trace with an 'init' event.")
+        elif op == "request":
+            t0 = time.perf_counter()
+            success, message = banker.request_resources(event["pid"], event["vector"], wait=wait, on_grant=on_grant)
+            stats.latency.record(time.perf_counter() - t0)
+            stats.count_request(success, message)
+        elif op == "release":
+            success, _ = banker.release_resources(event["pid"], event["vector"])
+            if success:
+                stats.releases += 1
+            else:
+                stats.rejected_releases += 1
+        elif op == "complete":
+            banker.complete_process(event["pid"])
+            stats.completions += 1
+        else:
+            raise ValueError(f"Unknown event op '{op}'.")
+
+        stats.events += 1
+        offset = next_offset
+        if checkpoint and stats.events % checkpoint_every == 0:
+            write_checkpoint(checkpoint, banker, stats, offset)
+
+    stats.elapsed = time.perf_counter() - start
+    if checkpoint and banker is not None:
+        write_checkpoint(checkpoint, banker, stats, offset)
+    return banker, stats
+
+
+def random_state(num_processes, num_resources, seed=0, max_alloc=3, max_need=5):
+    """
+    Builds a random state that is safe but tight: available is the smallest
+    vector for which a random permutation of the processes is a safe sequence,
+    so the safety check has to work for every process it releases.
+    :return: A tuple (available, max_demand, allocation) of plain lists.
+    """
+    rng = random.Random(seed)
+    allocation = [[rng.randint(0, max_alloc) for _ in range(num_resources)] for _ in range(num_processes)]
+    need = [[rng.randint(0, max_need) for _ in range(num_resources)] for _ in range(num_processes)]
+    max_demand = [[a + n for a, n in zip(alloc_row, need_row)] for alloc_row, need_row in zip(allocation, need)]
+
+    order = list(range(num_processes))
+    rng.shuffle(order)
+    available = [0] * num_resources
+    released = [0] * num_resources
+    for i in order:
+        for j in range(num_resources):
+            available[j] = max(available[j], need[i][j] - released[j])
+            released[j] += allocation[i][j]
+
+    return available, max_demand, allocation
+
+
+def generate_trace(path, num_events, num_processes, num_resources, seed=0):
+    """
+    Writes a synthetic JSONL trace: an init event followed by a random mix
+    of small requests, releases and occasional completions. The generator
+    tracks what each process would hold if every request were granted, so
+    requests stay within the claim and releases within the holdings.
+    """
+    rng = random.Random(seed)
+    max_demand = [[rng.randint(1, 6) for _ in range(num_resources)] for _ in range(num_processes)]
+    allocation = [[0] * num_resources for _ in range(num_processes)]
+    available = [max(3, num_processes // 2) for _ in range(num_resources)]
+    held = [[0] * num_resources for _ in range(num_processes)]
+    live = list(range(num_processes))
+
+    with open(path, "w") as f:
+        f.write(json.dumps({"op": "init", "available": available,
+                            "max_demand": max_demand, "allocation": allocation}) + "\n")
+        for _ in range(num_events):
+            if not live:
+                break
+            pid = rng.choice(live)
+            r = rng.random()
+            if r < 0.55:
+                vector = [rng.randint(0, min(1, max_demand[pid][j] - held[pid][j])) for j in range(num_resources)]
+                held[pid] = [h + v for h, v in zip(held[pid], vector)]
+                event = {"op": "request", "pid": pid, "vector": vector}
+            elif r < 0.998:
+                vector = [rng.randint(0, h) for h in held[pid]]
+                held[pid] = [h - v for h, v in zip(held[pid], vector)]
+                event = {"op": "release", "pid": pid, "vector": vector}
+            else:
+                live.remove(pid)
+                event = {"op": "complete", "pid": pid}
+            f.write(json.dumps(event) + "\n")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay allocation traces through the Banker's Algorithm")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_run = sub.add_parser("run", help="replay a trace")
+    p_run.add_argument("trace")
+    p_run.add_argument("--state", help="JSON file with available, max_demand and allocation")
+    p_run.add_argument("--format", choices=["jsonl", "csv"], help="default: from the file extension")
+    p_run.add_argument("--engine", choices=sorted(ENGINES), default="incremental")
+    p_run.add_argument("--checkpoint", help="checkpoint file to write (and resume from with --resume)")
+    p_run.add_argument("--checkpoint-every", type=int, default=100000)
+    p_run.add_argument("--resume", action="store_true")
+    p_run.add_argument("--wait", action="store_true", help="queue requests that must wait")
+    p_run.add_argument("--limit", type=int, help="stop after this many events")
+
+    p_gen = sub.add_parser("generate", help="write a synthetic JSONL trace")
+    p_gen.add_argument("trace")
+    p_gen.add_argument("--events", type=int, default=100000)
+    p_gen.add_argument("--processes", type=int, default=1000)
+    p_gen.add_argument("--resources", type=int, default=8)
+    p_gen.add_argument("--seed", type=int, default=0)
+
+    args = parser.parse_args(argv)
+    if args.command == "generate":
+        generate_trace(args.trace, args.events, args.processes, args.resources, args.seed)
+        return
+
+    state = None
+    if args.state:
+        with open(args.state) as f:
+            state = json.load(f)
+    banker, stats = replay(args.trace, state, args.engine, args.format, args.checkpoint,
+                      args.checkpoint_every, args.resume, args.wait, args.limit)
+    stats.report(banker)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,403 @@
+# bankers_server.py
+"""
+Local asyncio service around one BankersAlgorithm instance.
+
+Worker processes talk to the banker over a TCP or Unix socket with a
+line-delimited protocol. Every command line starts with a client-chosen id
+that the reply echoes, so a client can pipeline many commands without
+waiting for each reply:
+
+    <id> REQ <pid> <v0,v1,...>     request resources
+    <id> REL <pid> <v0,v1,...>     release resources
+    <id> DONE <pid>                complete a process (release everything)
+    <id> MAX <pid>                 max_grantable(pid)
+    <id> INFO                      sizes, available and queue length (JSON)
+    <id> STATE                     full matrices (JSON)
+    <id> METRICS                   metrics snapshot (JSON)
+
+Replies are "<id> OK <message>", "<id> NO <message>" for a denied request
+or release, and "<id> ERR <message>" for a malformed command.
+
+Requests arriving within a short group-commit window are admitted together
+with request_resources_batch. Any other command first flushes the open
+window, so every connection sees its own commands applied in order.
+
+Usage:
+    python bankers_server.py serve [--socket /tmp/banker.sock | --port 7878]
+                                   [--state state.json | --processes 1000 --resources 8]
+    python bankers_server.py loadgen [--clients 1,10,100,1000] [--duration 2] [--pipeline 1]
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+from bankers_metrics import LatencyHistogram
+from bankers_replay import ENGINES, make_banker, random_state, state_to_dict
+
+
+class BankerServer:
+    """Serves one banker to many connections, batching concurrent requests."""
+
+    def __init__(self, banker, window=0.0005, max_batch=256, order="fifo"):
+        """
+        :param banker: The BankersAlgorithm instance to serve.
+        :param window: Seconds a group-commit window stays open after its first request.
+        :param max_batch: Requests that close a window early.
+        :param order: Admission order passed to request_resources_batch.
+        """
+        self.banker = banker
+        self.window = window
+        self.max_batch = max_batch
+        self.order = order
+        self.batches = 0
+        self.batched_requests = 0
+        self._pending = []  # (process_id, request, future) waiting for the window to close
+        self._flush_handle = None
+
+    async def start(self, socket_path=None, host="127.0.0.1", port=7878):
+        if socket_path:
+            return await asyncio.start_unix_server(self.handle_connection, path=socket_path)
+        return await asyncio.start_server(self.handle_connection, host, port)
+
+    async def handle_connection(self, reader, writer):
+        try:
+            async for line in reader:
+                self.dispatch(line, writer)
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    def dispatch(self, line, writer):
+        """
+        :param line: One raw command line; a line that is not valid UTF-8 gets
+                     an ERR reply like any other malformed command.
+        """
+        fields = line.split()
+        if not fields:
+            return
+        rid = fields[0].decode(errors="replace")
+        try:
+            fields = line.decode().split()
+            op = fields[1].upper()
+            if op == "REQ":
+                pid, request = self._parse_vector_command(fields)
+                self._submit(rid, pid, request, writer)
+                return
+            # Everything else sees the effect of the requests already received
+            self.flush()
+            if op == "REL":
+                pid, release = self._parse_vector_command(fields)
+                success, message = self.banker.release_resources(pid, release)
+                self._reply(writer, rid, "OK" if success else "NO", message)
+            elif op == "DONE":
+                pid = self._parse_pid(fields)
+                success, message = self.banker.complete_process(pid)
+                self._reply(writer, rid, "OK" if success else "NO", message)
+            elif op == "MAX":
+                pid = self._parse_pid(fields)
+                self._reply(writer, rid, "OK", json.dumps(self.banker.max_grantable(pid)))
+            elif op == "INFO":
+                self._reply(writer, rid, "OK", json.dumps(self.info()))
+            elif op == "STATE":
+                self._reply(writer, rid, "OK", json.dumps(state_to_dict(self.banker)))
+            elif op == "METRICS":
+                metrics = self.banker.metrics
+                snapshot = metrics.snapshot(self.banker) if metrics is not None else {}
+                snapshot["batches"] = self.batches
+                snapshot["batched_requests"] = self.batched_requests
+                self._reply(writer, rid, "OK", json.dumps(snapshot))
+            else:
+                raise ValueError(f"Unknown command '{op}'.")
+        except (IndexError, ValueError) as exc:
+            self._reply(writer, rid, "ERR", str(exc) or "Malformed command.")
+
+    def info(self):
+        return {
+            "processes": self.banker.num_processes,
+            "resources": self.banker.num_resources,
+            "available": [int(x) for x in self.banker.available],
+            "pending_requests": len(self.banker.pending_requests()),
+        }
+
+    def _submit(self, rid, pid, request, writer):
+        """Adds a request to the open group-commit window, opening one if needed."""
+        future = asyncio.get_running_loop().create_future()
+        future.add_done_callback(lambda f: self._reply_result(writer, rid, f))
+        self._pending.append((pid, request, future))
+        if len(self._pending) >= self.max_batch:
+            self.flush()
+        elif self._flush_handle is None:
+            self._flush_handle = asyncio.get_running_loop().call_later(self.window, self.flush)
+
+    def flush(self):
+        """Admits every request in the open window with one batch call."""
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        if not self._pending:
+            return
+        batch, self._pending = self._pending, []
+        self.batches += 1
+        self.batched_requests += len(batch)
+        try:
+            results = self.banker.request_resources_batch([(pid, request) for pid, request, _ in batch], self.order)
+        except Exception as exc:
+            for _, _, future in batch:
+                future.set_exception(exc)
+            return
+        for (_, _, future), result in zip(batch, results):
+            future.set_result(result)
+
+    def _parse_pid(self, fields):
+        pid = int(fields[2])
+        if not 0 <= pid < self.banker.num_processes:
+            raise ValueError(f"Process {pid} does not exist.")
+        return pid
+
+    def _parse_vector_command(self, fields):
+        pid = self._parse_pid(fields)
+        vector = [int(x) for x in fields[3].split(",")]
+        if len(vector) != self.banker.num_resources or min(vector) < 0:
+            raise ValueError(f"Expected {self.banker.num_resources} non-negative amounts.")
+        return pid, vector
+
+    def _reply_result(self, writer, rid, future):
+        if future.cancelled():
+            return
+        if future.exception() is not None:
+            self._reply(writer, rid, "ERR", str(future.exception()))
+        else:
+            success, message = future.result()
+            self._reply(writer, rid, "OK" if success else "NO", message)
+
+    @staticmethod
+    def _reply(writer, rid, status, message):
+        if not writer.is_closing():
+            writer.write(f"{rid} {status} {message}\n".encode())
+
+
+class BankerClient:
+    """
+    Asyncio client for BankerServer. Calls may be issued concurrently from
+    many tasks over one connection; replies are matched by id.
+    """
+
+    def __init__(self, reader, writer):
+        self._reader = reader
+        self._writer = writer
+        self._next_id = 0
+        self._waiting = {}  # id -> future
+        self._reader_task = asyncio.create_task(self._read_replies())
+
+    @classmethod
+    async def connect(cls, socket_path=None, host="127.0.0.1", port=7878):
+        if socket_path:
+            reader, writer = await asyncio.open_unix_connection(socket_path)
+        else:
+            reader, writer = await asyncio.open_connection(host, port)
+        return cls(reader, writer)
+
+    async def request(self, process_id, request):
+        """:return: A tuple (boolean, string), as from request_resources."""
+        status, message = await self._call(f"REQ {process_id} {','.join(map(str, request))}")
+        return status == "OK", message
+
+    async def release(self, process_id, release):
+        status, message = await self._call(f"REL {process_id} {','.join(map(str, release))}")
+        return status == "OK", message
+
+    async def complete(self, process_id):
+        status, message = await self._call(f"DONE {process_id}")
+        return status == "OK", message
+
+    async def max_grantable(self, process_id):
+        _, payload = await self._call(f"MAX {process_id}")
+        return json.loads(payload)
+
+    async def info(self):
+        _, payload = await self._call("INFO")
+        return json.loads(payload)
+
+    async def state(self):
+        _, payload = await self._call("STATE")
+        return json.loads(payload)
+
+    async def metrics(self):
+        _, payload = await self._call("METRICS")
+        return json.loads(payload)
+
+    async def close(self):
+        self._writer.close()
+        self._reader_task.cancel()
+        try:
+            await self._writer.wait_closed()
+        except ConnectionError:
+            pass
+
+    async def _call(self, command):
+        self._next_id += 1
+        rid = str(self._next_id)
+        future = asyncio.get_running_loop().create_future()
+        self._waiting[rid] = future
+        self._writer.write(f"{rid} {command}\n".encode())
+        await self._writer.drain()
+        status, message = await future
+        if status == "ERR":
+            raise ValueError(message)
+        return status, message
+
+    async def _read_replies(self):
+        try:
+            async for line in self._reader:
+                rid, status, message = line.decode().rstrip("\n").split(" ", 2)
+                future = self._waiting.pop(rid, None)
+                if future is not None and not future.done():
+                    future.set_result((status, message))
+        finally:
+            for future in self._waiting.values():
+                if not future.done():
+                    future.set_exception(ConnectionError("Connection to the banker closed."))
+
+
+async def run_load(connect, num_clients, duration, pipeline, seed=0):
+    """
+    Drives the server from num_clients connections, each keeping `pipeline`
+    request/release cycles in flight, for `duration` seconds.
+    :param connect: Keyword arguments for BankerClient.connect.
+    :return: A tuple (requests, granted, elapsed, LatencyHistogram of request round trips).
+    """
+    latency = LatencyHistogram()
+    counts = {"requests": 0, "granted": 0}
+    clients = [await BankerClient.connect(**connect) for _ in range(num_clients)]
+    info = await clients[0].info()
+    n, m = info["processes"], info["resources"]
+
+    async def worker(client, rng, deadline):
+        while time.perf_counter() < deadline:
+            pid = rng.randrange(n)
+            request = [0] * m
+            request[rng.randrange(m)] = 1
+            t0 = time.perf_counter()
+            success, _ = await client.request(pid, request)
+            latency.record(time.perf_counter() - t0)
+            counts["requests"] += 1
+            if success:
+                counts["granted"] += 1
+                await client.release(pid, request)
+
+    start = time.perf_counter()
+    deadline = start + duration
+    rng = random.Random(seed)
+    await asyncio.gather(*(worker(client, random.Random(rng.random()), deadline)
+                           for client in clients for _ in range(pipeline)))
+    elapsed = time.perf_counter() - start
+    for client in clients:
+        await client.close()
+    return counts["requests"], counts["granted"], elapsed, latency
+
+
+def loadgen(client_counts, duration, pipeline, connect=None, num_processes=1000, num_resources=8):
+    """
+    Reports throughput and p50/p99 request latency for each client count.
+    Without `connect`, a server is started in a subprocess on a Unix
+    socket with a random state and stopped afterwards.
+    """
+    server = None
+    if connect is None:
+        socket_path = os.path.join(tempfile.mkdtemp(), "banker.sock")
+        server = subprocess.Popen([sys.executable, os.path.abspath(__file__), "serve", "--socket", socket_path,
+                                   "--processes", str(num_processes), "--resources", str(num_resources)])
+        while not os.path.exists(socket_path):
+            if server.poll() is not None:
+                raise RuntimeError("The banker server exited during startup.")
+            time.sleep(0.05)
+        connect = {"socket_path": socket_path}
+
+    try:
+        print(f"{'clients':>8} {'req/s':>10} {'granted':>8} {'p50 (us)':>10} {'p99 (us)':>10}")
+        for num_clients in client_counts:
+            requests, granted, elapsed, latency = asyncio.run(run_load(connect, num_clients, duration, pipeline))
+            print(f"{num_clients:>8} {requests / elapsed:>10.0f} {granted / max(requests, 1):>8.1%}"
+                  f" {latency.percentile(50) * 1e6:>10.0f} {latency.percentile(99) * 1e6:>10.0f}")
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+
+def serve(args):
+    if args.state:
+        with open(args.state) as f:
+            state = json.load(f)
+    else:
+        available, max_demand, allocation = random_state(args.processes, args.resources, seed=args.seed)
+        # Headroom over the tight random state, so most requests can be granted
+        available = [a + args.processes // 10 for a in available]
+        state = {"available": available, "max_demand": max_demand, "allocation": allocation}
+    server = BankerServer(make_banker(args.engine, state), args.window_ms / 1000, args.max_batch)
+
+    async def main():
+        listener = await server.start(args.socket, args.host, args.port)
+        async with listener:
+            await listener.serve_forever()
+
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if args.socket and os.path.exists(args.socket):
+            os.remove(args.socket)
+
+
+def _int_list(text):
+    return [int(x) for x in text.split(",")]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Banker's Algorithm service")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_serve = sub.add_parser("serve", help="run the banker service")
+    p_serve.add_argument("--socket", help="Unix socket path (default: TCP)")
+    p_serve.add_argument("--host", default="127.0.0.1")
+    p_serve.add_argument("--port", type=int, default=7878)
+    p_serve.add_argument("--state", help="JSON file with available, max_demand and allocation")
+    p_serve.add_argument("--processes", type=int, default=1000, help="size of a random state (without --state)")
+    p_serve.add_argument("--resources", type=int, default=8)
+    p_serve.add_argument("--seed", type=int, default=0)
+    p_serve.add_argument("--engine", choices=sorted(ENGINES), default="incremental")
+    p_serve.add_argument("--window-ms", type=float, default=0.5, help="group-commit window")
+    p_serve.add_argument("--max-batch", type=int, default=256)
+
+    p_load = sub.add_parser("loadgen", help="measure throughput and latency against a server")
+    p_load.add_argument("--clients", type=_int_list, default=[1, 10, 100, 1000])
+    p_load.add_argument("--duration", type=float, default=2.0, help="seconds per client count")
+    p_load.add_argument("--pipeline", type=int, default=1, help="requests in flight per client")
+    p_load.add_argument("--socket", help="connect to a running server on this Unix socket")
+    p_load.add_argument("--port", type=int, help="connect to a running server on this TCP port")
+    p_load.add_argument("--processes", type=int, default=1000, help="state size of the spawned server")
+    p_load.add_argument("--resources", type=int, default=8)
+
+    args = parser.parse_args(argv)
+    if args.command == "serve":
+        serve(args)
+    elif args.command == "loadgen":
+        connect = None
+        if args.socket:
+            connect = {"socket_path": args.socket}
+        elif args.port:
+            connect = {"port": args.port}
+        loadgen(args.clients, args.duration, args.pipeline, connect, args.processes, args.resources)
+
+
+if __name__ == "__main__":
+    main()
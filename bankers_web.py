@@ -0,0 +1,304 @@
+# bankers_web.py
+"""
+Local HTTP and WebSocket backend for bankers_ui.html.
+
+The page keeps no copy of the algorithm: every operation is sent over a
+WebSocket to a BankersAlgorithm owned by the connection, and the reply
+carries only the table cells the operation changed, so the page patches
+its tables in place instead of re-rendering them.
+
+Messages from the page are JSON objects with a client-chosen "id" that
+the reply echoes:
+
+    {"id": 1, "op": "init", "available": [...], "max_demand": [[...]], "allocation": [[...]]}
+    {"id": 2, "op": "request", "pid": 1, "vector": [1, 0, 2]}
+    {"id": 3, "op": "release", "pid": 1, "vector": [1, 0, 0]}
+    {"id": 4, "op": "complete", "pid": 1}
+    {"id": 5, "op": "trace"}
+
+Replies:
+
+    {"id": 1, "type": "state", "available": [...], "max_demand": [[...]], "allocation": [[...]],
+     "need": [[...]], "safe": true, "sequence": [...]}
+    {"id": 2, "type": "result", "success": true, "message": "...",
+     "patches": [{"table": "allocation", "row": 1, "cells": {"0": 3, "2": 4}}, ...]}
+    {"id": 5, "type": "trace", "work": [...], "steps": [["check", 0], ["wait", 0],
+     ["release", 1, [...]], ..., ["safe", [...]]], "truncated": false}
+    {"id": 9, "type": "error", "message": "..."}
+
+Patch tables are "allocation", "max", "need" and "available" (row 0).
+
+Usage:
+    python bankers_web.py [--port 8000] [--engine incremental]
+"""
+import argparse
+import asyncio
+import base64
+import hashlib
+import json
+import os
+import struct
+from itertools import islice
+
+from bankers_replay import ENGINES, make_banker, state_to_dict
+
+PAGE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bankers_ui.html")
+WEBSOCKET_GUID = b"258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+MAX_MESSAGE = 64 * 1024 * 1024
+TRACE_LIMIT = 20000
+
+# (patch table, banker attribute) for the per-process matrices
+ROW_TABLES = (("allocation", "allocation"), ("max", "max_demand"), ("need", "need"))
+
+OP_CLOSE, OP_TEXT, OP_PING, OP_PONG = 0x8, 0x1, 0x9, 0xA
+
+
+class BankerSession:
+    """The banker behind one page, and the patches its operations produce."""
+
+    def __init__(self, engine="incremental"):
+        self.engine = engine
+        self.banker = None
+
+    def handle(self, message):
+        """
+        :param message: A decoded message from the page.
+        :return: The reply dict (without the id).
+        """
+        op = message.get("op")
+        if op == "init":
+            return self.init(message)
+        if self.banker is None:
+            raise ValueError("No state loaded; start a simulation first.")
+        if op == "trace":
+            return self.trace()
+        pid = self._parse_pid(message)
+        if op == "request":
+            return self.apply(pid, self.banker.request_resources, self._parse_vector(message))
+        if op == "release":
+            return self.apply(pid, self.banker.release_resources, self._parse_vector(message))
+        if op == "complete":
+            return self.apply(pid, self.banker.complete_process)
+        raise ValueError(f"Unknown op '{op}'.")
+
+    def init(self, message):
+        available = [int(x) for x in message["available"]]
+        max_demand = [[int(x) for x in row] for row in message["max_demand"]]
+        allocation = [[int(x) for x in row] for row in message["allocation"]]
+        m = len(available)
+        if not max_demand or len(max_demand) != len(allocation):
+            raise ValueError("max_demand and allocation need one row per process.")
+        for max_row, alloc_row in zip(max_demand, allocation):
+            if len(max_row) != m or len(alloc_row) != m:
+                raise ValueError(f"Every row needs {m} values.")
+            if min(alloc_row) < 0 or any(a > c for a, c in zip(alloc_row, max_row)):
+                raise ValueError("Allocation must be non-negative and within max_demand.")
+        if min(available) < 0:
+            raise ValueError("Available must be non-negative.")
+
+        self.banker = make_banker(self.engine, {"available": available, "max_demand": max_demand,
+                                                "allocation": allocation})
+        safe, sequence = self.banker.is_safe_state()
+        state = state_to_dict(self.banker)
+        del state["pending"]
+        state["need"] = [[int(x) for x in row] for row in self.banker.need]
+        return dict(state, type="state", safe=safe, sequence=sequence)
+
+    def apply(self, pid, operation, *args):
+        """
+        Runs one operation and diffs the rows it can have changed: the
+        process's own row and those of queued requests it may have granted.
+        Costs O(touched rows * m) instead of O(n * m).
+        """
+        touched = {pid}
+        touched.update(waiting for waiting, _ in self.banker.pending_requests())
+        before = {i: self._row_values(i) for i in touched}
+        available = [int(x) for x in self.banker.available]
+
+        success, message = operation(pid, *args)
+
+        patches = []
+        for i in sorted(touched):
+            for (table, _), old, new in zip(ROW_TABLES, before[i], self._row_values(i)):
+                cells = _changed_cells(old, new)
+                if cells:
+                    patches.append({"table": table, "row": i, "cells": cells})
+        cells = _changed_cells(available, [int(x) for x in self.banker.available])
+        if cells:
+            patches.append({"table": "available", "row": 0, "cells": cells})
+        return {"type": "result", "success": success, "message": message, "patches": patches}
+
+    def trace(self):
+        """
+        The steps of safety_trace(), capped at TRACE_LIMIT. The trace always
+        follows the scan, whatever the engine's strategy, so the page can
+        show every process that must wait. The work vector is only sent when
+        it changes, i.e. on release steps.
+        """
+        banker = self.banker
+        steps = []
+        work = [int(x) for x in banker.available]
+        for kind, subject, snapshot in islice(banker.safety_trace("scan"), TRACE_LIMIT):
+            steps.append([kind, subject, list(snapshot)] if kind == "release" else [kind, subject])
+        truncated = len(steps) == TRACE_LIMIT and steps[-1][0] not in ("safe", "deadlock")
+        if truncated:
+            # Close the trace with the verdict; the deadlocked set is not known here
+            safe, sequence = banker.is_safe_state()
+            steps.append(["safe", sequence] if safe else ["deadlock", []])
+        return {"type": "trace", "work": work, "steps": steps, "truncated": truncated}
+
+    def _row_values(self, pid):
+        return [[int(x) for x in getattr(self.banker, attr)[pid]] for _, attr in ROW_TABLES]
+
+    def _parse_pid(self, message):
+        pid = int(message["pid"])
+        if not 0 <= pid < self.banker.num_processes:
+            raise ValueError(f"Process {pid} does not exist.")
+        return pid
+
+    def _parse_vector(self, message):
+        vector = [int(x) for x in message["vector"]]
+        if len(vector) != self.banker.num_resources or min(vector) < 0:
+            raise ValueError(f"Expected {self.banker.num_resources} non-negative amounts.")
+        return vector
+
+
+def _changed_cells(old, new):
+    return {j: b for j, (a, b) in enumerate(zip(old, new)) if a != b}
+
+
+class WebServer:
+    """Serves the page over HTTP and one BankerSession per WebSocket."""
+
+    def __init__(self, engine="incremental", page_path=PAGE_PATH):
+        self.engine = engine
+        self.page_path = page_path
+
+    async def start(self, host="127.0.0.1", port=8000):
+        return await asyncio.start_server(self.handle_connection, host, port)
+
+    async def handle_connection(self, reader, writer):
+        try:
+            request_line = (await reader.readline()).decode("latin-1").split()
+            headers = {}
+            while True:
+                line = (await reader.readline()).decode("latin-1").strip()
+                if not line:
+                    break
+                name, _, value = line.partition(":")
+                headers[name.strip().lower()] = value.strip()
+
+            if len(request_line) < 2 or request_line[0] != "GET":
+                self._respond(writer, "405 Method Not Allowed", b"Only GET is supported.\n")
+            elif request_line[1] == "/ws" and headers.get("upgrade", "").lower() == "websocket":
+                await self.run_websocket(reader, writer, headers)
+            elif request_line[1] in ("/", "/index.html", "/bankers_ui.html"):
+                with open(self.page_path, "rb") as f:
+                    self._respond(writer, "200 OK", f.read(), "text/html; charset=utf-8")
+            else:
+                self._respond(writer, "404 Not Found", b"Not found.\n")
+            await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def run_websocket(self, reader, writer, headers):
+        digest = hashlib.sha1(headers["sec-websocket-key"].encode() + WEBSOCKET_GUID).digest()
+        writer.write(b"HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+                     b"Sec-WebSocket-Accept: " + base64.b64encode(digest) + b"\r\n\r\n")
+        session = BankerSession(self.engine)
+        while True:
+            payload = await read_message(reader, writer)
+            if payload is None:
+                return
+            try:
+                message = json.loads(payload)
+                rid = message.get("id")
+            except (ValueError, AttributeError):
+                message, rid = {}, None
+            try:
+                reply = session.handle(message)
+            except (KeyError, TypeError, ValueError) as exc:
+                reply = {"type": "error", "message": str(exc) or "Malformed message."}
+            reply["id"] = rid
+            writer.write(encode_frame(OP_TEXT, json.dumps(reply, separators=(",", ":")).encode()))
+            await writer.drain()
+
+    @staticmethod
+    def _respond(writer, status, body, content_type="text/plain; charset=utf-8"):
+        writer.write(f"HTTP/1.1 {status}\r\nContent-Type: {content_type}\r\n"
+                     f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body)
+
+
+def encode_frame(opcode, payload):
+    """An unmasked, unfragmented server-to-client WebSocket frame."""
+    n = len(payload)
+    if n < 126:
+        header = struct.pack("!BB", 0x80 | opcode, n)
+    elif n < 1 << 16:
+        header = struct.pack("!BBH", 0x80 | opcode, 126, n)
+    else:
+        header = struct.pack("!BBQ", 0x80 | opcode, 127, n)
+    return header + payload
+
+
+async def read_message(reader, writer):
+    """
+    Reads one (possibly fragmented) data message, answering pings on the way.
+    :return: The payload bytes, or None once the peer closed the socket.
+    """
+    chunks = []
+    while True:
+        head = await reader.readexactly(2)
+        fin, opcode = head[0] & 0x80, head[0] & 0x0F
+        length = head[1] & 0x7F
+        if length == 126:
+            length = struct.unpack("!H", await reader.readexactly(2))[0]
+        elif length == 127:
+            length = struct.unpack("!Q", await reader.readexactly(8))[0]
+        if length > MAX_MESSAGE:
+            writer.write(encode_frame(OP_CLOSE, struct.pack("!H", 1009)))
+            return None
+        mask = await reader.readexactly(4) if head[1] & 0x80 else None
+        payload = await reader.readexactly(length)
+        if mask and length:
+            # XOR the whole payload at once rather than byte by byte
+            key = (mask * (length // 4 + 1))[:length]
+            payload = (int.from_bytes(payload, "big") ^ int.from_bytes(key, "big")).to_bytes(length, "big")
+
+        if opcode == OP_CLOSE:
+            writer.write(encode_frame(OP_CLOSE, payload[:2]))
+            return None
+        if opcode == OP_PING:
+            writer.write(encode_frame(OP_PONG, payload))
+            continue
+        if opcode == OP_PONG:
+            continue
+        chunks.append(payload)
+        if fin:
+            return b"".join(chunks)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve bankers_ui.html backed by the Python Banker's Algorithm")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--engine", choices=sorted(ENGINES), default="incremental")
+    args = parser.parse_args(argv)
+    server = WebServer(args.engine)
+
+    async def run():
+        listener = await server.start(args.host, args.port)
+        print(f"Serving the Banker's Algorithm visualizer on http://{args.host}:{args.port}/")
+        async with listener:
+            await listener.serve_forever()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
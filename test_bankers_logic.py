@@ -0,0 +1,345 @@
+# test_bankers_logic.py
+"""
+Tests for bankers_logic.py. The property tests check that on random safe
+and unsafe states every engine and safety strategy agrees with the original
+scan; the rest cover forks, headroom, detection mode and state files.
+
+Run with:
+    python -m pytest test_bankers_logic.py
+    python -m unittest test_bankers_logic
+"""
+import os
+import random
+import tempfile
+import unittest
+
+from bankers_logic import BankersAlgorithm, CompactBankersAlgorithm, FlatMatrix, NumpyBankersAlgorithm, np
+from bankers_replay import random_state
+
+TRIALS = 300
+
+
+def engine_factories():
+    """(name, factory) pairs for every engine and strategy compared against the scan."""
+    engines = [(name, lambda a, mx, al, name=name: BankersAlgorithm(a, mx, al, strategy=name))
+               for name in BankersAlgorithm.SAFETY_STRATEGIES]
+    engines += [("compact", CompactBankersAlgorithm),
+                # FlatMatrix inputs are wrapped in place, with need derived by LazyNeedMatrix
+                ("compact-lazy", lambda a, mx, al: CompactBankersAlgorithm(
+                    a, FlatMatrix.from_rows(mx, len(a)), FlatMatrix.from_rows(al, len(a))))]
+    if np is not None:
+        engines.append(("numpy", NumpyBankersAlgorithm))
+    return engines
+
+
+def state_of(banker):
+    return ([int(x) for x in banker.available],
+            [[int(x) for x in row] for row in banker.allocation],
+            [[int(x) for x in row] for row in banker.need])
+
+
+def random_trial_state(rng):
+    """A small random state; about half of them are unsafe."""
+    n, m = rng.randint(1, 12), rng.randint(1, 5)
+    available, max_demand, allocation = random_state(n, m, seed=rng.random())
+    # Knock a unit off available now and then to produce unsafe states
+    if rng.random() < 0.5:
+        j = rng.randrange(m)
+        available[j] = max(0, available[j] - rng.randint(1, 2))
+    return available, max_demand, allocation
+
+
+class EngineAgreementTest(unittest.TestCase):
+
+    def test_engines_agree_with_scan(self):
+        """
+        On random request, release and fork/commit/discard sequences every
+        engine and strategy, and the end of safety_trace(), give the same
+        answers as the scan. The vectorized NumPy check may find a different
+        safe sequence, so only its verdict is compared and its sequence verified.
+        """
+        rng = random.Random(0)
+        engines = engine_factories()
+        for trial in range(TRIALS):
+            available, max_demand, allocation = random_trial_state(rng)
+            n, m = len(max_demand), len(available)
+            bankers = {name: factory(available, [list(r) for r in max_demand], [list(r) for r in allocation])
+                       for name, factory in engines}
+            scan = bankers["scan"]
+            for _ in range(10):
+                results = {name: banker.is_safe_state() for name, banker in bankers.items()}
+                expected = results["scan"]
+                for name, result in results.items():
+                    self.assertEqual(result[0], expected[0], f"trial {trial}: {name} disagrees on safety")
+                    if name == "numpy":
+                        self.assertEqual(sorted(result[1]), sorted(expected[1]), f"trial {trial}")
+                        self.assertTrue(scan._verify_sequence(result[1]),
+                                        f"trial {trial}: numpy returned an invalid safe sequence")
+                    else:
+                        self.assertEqual(result, expected, f"trial {trial}: {name} returned a different sequence")
+
+                for name, banker in bankers.items():
+                    steps = list(banker.safety_trace())
+                    kind, subject, _ = steps[-1]
+                    self.assertEqual((kind == "safe", subject if kind == "safe" else []), results[name],
+                                     f"trial {trial}: safety_trace disagrees with the {name} check")
+                    if kind == "deadlock":
+                        released = [pid for step, pid, _ in steps if step == "release"]
+                        self.assertEqual(sorted(released + subject), list(range(n)),
+                                         f"trial {trial}: {name} trace reports the wrong deadlocked set")
+
+                # One operation, applied to every banker (and to a fork of it now and then)
+                pid = rng.randrange(n)
+                op = rng.random()
+                if op < 0.5:
+                    request = [rng.randint(0, 2) for _ in range(m)]
+                    replies = {name: banker.request_resources(pid, request) for name, banker in bankers.items()}
+                elif op < 0.8:
+                    release = [rng.randint(0, int(x)) for x in scan.allocation[pid]]
+                    replies = {name: banker.release_resources(pid, release) for name, banker in bankers.items()}
+                else:
+                    request = [rng.randint(0, 2) for _ in range(m)]
+                    keep = rng.random() < 0.5
+                    replies = {}
+                    for name, banker in bankers.items():
+                        fork = banker.fork()
+                        replies[name] = fork.request_resources(pid, request)
+                        if keep:
+                            fork.commit()
+                        else:
+                            # The parent must not see the fork's writes
+                            before = state_of(banker)
+                            fork.discard()
+                            self.assertEqual(state_of(banker), before, f"trial {trial}: {name} fork leaked into its parent")
+                verdicts = {name: ok for name, (ok, _) in replies.items()}
+                self.assertEqual(len(set(verdicts.values())), 1, f"trial {trial}: replies differ {replies}")
+                for name, banker in bankers.items():
+                    self.assertEqual(state_of(banker), state_of(scan), f"trial {trial}: {name} diverged")
+
+    def test_scan_trace_from_any_engine(self):
+        """safety_trace("scan") gives the step-by-step scan, wait steps included, on every engine."""
+        rng = random.Random(5)
+        for trial in range(TRIALS // 3):
+            available, max_demand, allocation = random_trial_state(rng)
+            bankers = {name: factory(available, [list(r) for r in max_demand], [list(r) for r in allocation])
+                       for name, factory in engine_factories()}
+            expected = [(kind, subject, list(work)) for kind, subject, work in bankers["scan"].safety_trace()]
+            for name, banker in bankers.items():
+                steps = [(kind, subject, [int(x) for x in work]) for kind, subject, work in banker.safety_trace("scan")]
+                self.assertEqual(steps, expected, f"trial {trial}: {name}")
+
+    def test_wait_queues_agree(self):
+        """
+        With wait=True every engine queues, wakes and grants the same requests.
+        Repeated and growing requests of one process exercise the re-queueing
+        of waiters already known to be unsafe.
+        """
+        rng = random.Random(2)
+        engines = engine_factories()
+        for trial in range(TRIALS // 3):
+            available, max_demand, allocation = random_trial_state(rng)
+            n, m = len(max_demand), len(available)
+            bankers = {name: factory(available, [list(r) for r in max_demand], [list(r) for r in allocation])
+                       for name, factory in engines}
+            scan = bankers["scan"]
+            for _ in range(30):
+                pid = rng.randrange(n)
+                if rng.random() < 0.6:
+                    request = [rng.randint(0, 1) for _ in range(m)]
+                    for _ in range(rng.randint(1, 3)):
+                        for banker in bankers.values():
+                            banker.request_resources(pid, list(request), wait=True)
+                        request[rng.randrange(m)] += 1
+                else:
+                    release = [rng.randint(0, int(x)) for x in scan.allocation[pid]]
+                    for banker in bankers.values():
+                        banker.release_resources(pid, release)
+                for name, banker in bankers.items():
+                    self.assertEqual(banker.pending_requests(), scan.pending_requests(),
+                                     f"trial {trial}: {name} queue differs")
+                    self.assertEqual(state_of(banker), state_of(scan), f"trial {trial}: {name} diverged")
+
+    def test_batch_matches_single_calls(self):
+        """request_resources_batch grants the same requests as a loop of single calls."""
+        rng = random.Random(1)
+        for trial in range(TRIALS):
+            available, max_demand, allocation = random_trial_state(rng)
+            n, m = len(max_demand), len(available)
+            batched, single = (BankersAlgorithm(available, [list(r) for r in max_demand], [list(r) for r in allocation])
+                               for _ in range(2))
+            burst = [(rng.randrange(n), [rng.randint(0, 2) for _ in range(m)]) for _ in range(rng.randint(1, 8))]
+            granted = [ok for ok, _ in batched.request_resources_batch(burst)]
+            expected = [single.request_resources(pid, request)[0] for pid, request in burst]
+            self.assertEqual(granted, expected, f"trial {trial}: batch and single calls grant differently")
+            self.assertEqual(batched.allocation, single.allocation, f"trial {trial}: batch left a different state")
+
+    def test_batch_retries_candidates_crowded_out_by_optimistic_pass(self):
+        banker = BankersAlgorithm([2], [[3], [3], [4]], [[0], [2], [1]])
+        results = banker.request_resources_batch([(0, [2]), (2, [1])])
+        self.assertEqual([ok for ok, _ in results], [False, True])
+
+    def test_candidates_are_judged_independently(self):
+        """Each evaluate_candidates answer, message included, matches a lone request on a fresh fork."""
+        rng = random.Random(3)
+        for trial in range(TRIALS // 3):
+            available, max_demand, allocation = random_trial_state(rng)
+            n, m = len(max_demand), len(available)
+            banker = BankersAlgorithm(available, max_demand, allocation)
+            banker.is_safe_state()
+            candidates = [(rng.randrange(n), [rng.randint(0, 2) for _ in range(m)]) for _ in range(6)]
+            expected = []
+            for pid, request in candidates:
+                fork = banker.fork()
+                expected.append(fork.request_resources(pid, request))
+                fork.discard()
+            self.assertEqual(banker.evaluate_candidates(candidates), expected, f"trial {trial}")
+
+
+class HeadroomTest(unittest.TestCase):
+
+    def test_max_grantable_matches_requests(self):
+        """Each entry is the largest single-resource request that would be granted, and asking changes nothing."""
+        rng = random.Random(4)
+        for trial in range(TRIALS // 3):
+            available, max_demand, allocation = random_trial_state(rng)
+            n, m = len(max_demand), len(available)
+            for name, factory in engine_factories():
+                banker = factory(available, [list(r) for r in max_demand], [list(r) for r in allocation])
+                banker.request_resources(rng.randrange(n), [0] * m)  # leaves a certificate behind
+                counters = (banker._certificate, banker.certificate_hits, banker.certificate_misses)
+                headroom = banker.headroom_matrix()
+                self.assertEqual((banker._certificate, banker.certificate_hits, banker.certificate_misses), counters,
+                                 f"trial {trial}: {name} headroom touched the request-side certificate")
+                for pid in range(n):
+                    for j in range(m):
+                        expected = 0
+                        for amount in range(1, min(int(banker.need[pid][j]), int(banker.available[j])) + 1):
+                            fork = banker.fork()
+                            granted = fork.request_resources(pid, [amount if k == j else 0 for k in range(m)])[0]
+                            fork.discard()
+                            if granted:
+                                expected = amount
+                        self.assertEqual(headroom[pid][j], expected, f"trial {trial}: {name} P{pid} R{j}")
+
+
+class StateFileTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def test_load_round_trips_save(self):
+        banker = BankersAlgorithm([3, 3, 2], [[7, 5, 3], [3, 2, 2], [9, 0, 2]], [[0, 1, 0], [2, 0, 0], [3, 0, 2]])
+        path = os.path.join(self.tmp.name, "state.bank")
+        banker.save(path)
+        for cls in (BankersAlgorithm, CompactBankersAlgorithm):
+            loaded = cls.load(path)
+            self.assertEqual(state_of(loaded), state_of(banker), cls.__name__)
+            self.assertEqual(loaded.is_safe_state(), banker.is_safe_state(), cls.__name__)
+
+    def test_load_rejects_allocation_outside_bounds(self):
+        for allocation in ([[0, 1, 0], [4, 0, 0]], [[0, -1, 0], [2, 0, 0]]):
+            # The constructor does not check the bounds, so it can write a bad file
+            path = os.path.join(self.tmp.name, "bad.bank")
+            BankersAlgorithm([3, 3, 2], [[7, 5, 3], [3, 2, 2]], allocation).save(path)
+            for cls in (BankersAlgorithm, CompactBankersAlgorithm):
+                with self.assertRaises(ValueError, msg=f"{cls.__name__} {allocation}"):
+                    cls.load(path)
+
+    @unittest.skipIf(np is None, "NumPy is not installed")
+    def test_from_numpy_rejects_allocation_outside_bounds(self):
+        path = os.path.join(self.tmp.name, "state.npz")
+        np.savez(path, available=[1, 1], max_demand=[[2, 2], [1, 1]], allocation=[[1, 3], [0, 0]])
+        with self.assertRaises(ValueError):
+            CompactBankersAlgorithm.from_numpy(path)
+        np.savez(path, available=[1, -1], max_demand=[[2, 2], [1, 1]], allocation=[[1, 1], [0, 0]])
+        with self.assertRaises(ValueError):
+            CompactBankersAlgorithm.from_numpy(path)
+
+
+class ForkTest(unittest.TestCase):
+
+    def test_closed_forks_leave_plain_matrices(self):
+        """
+        Once its forks are closed the parent's writes are folded back into its
+        own matrices; forks still open keep seeing the state they were taken from.
+        """
+        for name, factory in engine_factories():
+            banker = factory([4, 4], [[3, 3], [3, 3], [2, 2]], [[1, 1], [1, 1], [0, 0]])
+            plain = {attr: type(getattr(banker, attr)) for attr in ("max_demand", "allocation", "need")}
+            first, second = banker.fork(), banker.fork()
+            nested = second.fork()
+            taken = state_of(first)
+            banker.request_resources(0, [1, 0])
+            nested.request_resources(1, [2, 2])
+            self.assertEqual(state_of(nested)[1], [[1, 1], [3, 3], [0, 0]], name)
+            nested.discard()
+            second.discard()
+            banker.release_resources(2, [0, 0])
+            banker.request_resources(2, [1, 1])
+            expected = state_of(banker)
+            self.assertEqual(state_of(first), taken, f"{name}: an open fork saw its parent's writes")
+            first.discard()
+            for attr, cls in plain.items():
+                self.assertIs(type(getattr(banker, attr)), cls, f"{name}: {attr} still wrapped")
+            self.assertEqual(state_of(banker), expected, f"{name}: folding changed the parent's state")
+
+            fork = banker.fork()
+            fork.request_resources(1, [1, 1])
+            committed = state_of(fork)
+            fork.commit()
+            self.assertEqual(state_of(banker), committed, name)
+            for attr, cls in plain.items():
+                self.assertIs(type(getattr(banker, attr)), cls, f"{name}: {attr} still wrapped after commit")
+
+            # A nested fork closed after its own parent is folded back on the next fork
+            outer = banker.fork()
+            inner = outer.fork()
+            outer.discard()
+            inner.request_resources(0, [1, 1])
+            inner.discard()
+            expected = state_of(banker)
+            banker.fork().discard()
+            self.assertEqual(state_of(banker), expected, name)
+            for attr, cls in plain.items():
+                self.assertIs(type(getattr(banker, attr)), cls, f"{name}: {attr} still wrapped")
+
+    def test_fork_does_not_record_into_parent_metrics(self):
+        for name, factory in engine_factories():
+            banker = factory([3, 3], [[2, 2], [3, 3]], [[0, 0], [1, 1]])
+            metrics = banker.enable_metrics()
+            fork = banker.fork()
+            self.assertIsNone(fork.metrics, name)
+            fork.request_resources(0, [1, 1])
+            fork.release_resources(0, [1, 1])
+            self.assertEqual(sum(metrics.outcomes.values()), 0, f"{name}: fork traffic counted on the parent")
+            self.assertIs(fork.commit().metrics, metrics, name)
+
+    def test_fork_detection_does_not_call_parent_callback(self):
+        for name, factory in engine_factories():
+            reported = []
+            banker = factory([0], [[2], [2]], [[1], [1]])
+            banker.enable_detection(every=1, on_deadlock=reported.append)
+            fork = banker.fork()
+            fork.request_resources(0, [1])
+            fork.request_resources(1, [1])
+            self.assertEqual(fork.deadlocked, [0, 1], name)
+            self.assertEqual(reported, [], f"{name}: the fork's deadlock reached the parent's callback")
+            fork.discard()
+            banker.request_resources(0, [1])
+            banker.request_resources(1, [1])
+            self.assertEqual(reported, [[0, 1]], f"{name}: the parent lost its callback")
+
+
+class DetectionModeTest(unittest.TestCase):
+
+    def test_undeclared_claims_cannot_leave_detection_mode(self):
+        banker = BankersAlgorithm([1], None, [[1], [0]])
+        banker.enable_detection(every=1)
+        with self.assertRaises(ValueError):
+            banker.disable_detection()
+        self.assertIsNotNone(banker.detection)
+
+
+if __name__ == "__main__":
+    unittest.main()